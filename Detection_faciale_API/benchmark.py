@@ -0,0 +1,397 @@
+"""Banc d'essai hors ligne du système de reconnaissance.
+
+Mesure, pour des galeries synthétiques de 10 à 5000 personnes, la durée
+d'entraînement, le temps de chargement du modèle et la latence de prédiction,
+puis la latence du détecteur Haar par résolution sur une source d'images
+factice (ou enregistrée avec --frames). Les résultats sont écrits en JSON et
+peuvent être comparés à une référence: le code de sortie est 1 en cas de
+régression au-delà de la tolérance. Chaque mesure est la médiane de plusieurs
+répétitions (--repeats); les p95/p99 sont rapportés mais pas comparés.
+
+    python benchmark.py --sizes 10,100,1000 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.2
+"""
+import cv2
+import numpy as np
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from camera import open_source
+from dataset import PACKED_FACES_FILE, PACKED_LABELS_FILE, PACKED_INDEX_FILE, FACE_SIZE
+
+
+BENCHMARK_VERSION = 1
+
+# Sens de chaque mesure pour la comparaison: +1 plus grand est meilleur, -1 plus petit est meilleur
+METRIC_DIRECTIONS = {
+    "train_s": -1,
+    "load_s": -1,
+    "predict_ms_p50": -1,
+    "predict_ms_p95": -1,
+    "predict_ms_p99": -1,
+    "predict_per_s": 1,
+    "accuracy": 1,
+    "detect_ms_p50": -1,
+    "detect_ms_p95": -1,
+    "detect_fps": 1,
+    "recognize_ms_p50": -1,
+    "recognize_ms_p95": -1,
+}
+
+# Queues de distribution trop variables d'une exécution à l'autre: rapportées, pas comparées
+UNGATED_METRICS = {"predict_ms_p95", "predict_ms_p99", "detect_ms_p95", "recognize_ms_p95"}
+
+
+class SyntheticSource:
+    """Source d'images factice: bruit lissé reproductible, mêmes méthodes que camera.py"""
+
+    is_live = False
+
+    def __init__(self, width=640, height=480, count=50, seed=0):
+        self.width = width
+        self.height = height
+        self.count = count
+        self.seed = seed
+        self.position = 0
+
+    def open(self):
+        self.rng = np.random.default_rng(self.seed)
+        self.position = 0
+        return True
+
+    def read(self):
+        if self.position >= self.count:
+            return False, None
+        self.position += 1
+        small = self.rng.integers(0, 256, (self.height // 8, self.width // 8, 3), dtype=np.uint8)
+        return True, cv2.resize(small, (self.width, self.height), interpolation=cv2.INTER_CUBIC)
+
+    def release(self):
+        pass
+
+    def __str__(self):
+        return f"synthétique {self.width}x{self.height}"
+
+
+def synthetic_face(identity_field, rng):
+    """Un échantillon d'une identité: décalage, luminosité et bruit aléatoires"""
+    dx, dy = rng.integers(-4, 5, 2)
+    face = np.roll(identity_field, (dy, dx), axis=(0, 1))
+    face = face * rng.uniform(0.85, 1.15) + rng.normal(0, 6, face.shape)
+    return np.clip(face, 0, 255).astype(np.uint8)
+
+
+def identity_field(seed):
+    """Texture propre à une identité (bruit basse fréquence agrandi à 200x200)"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.uniform(0, 255, (25, 25)).astype(np.float32)
+    return cv2.resize(coarse, (FACE_SIZE, FACE_SIZE), interpolation=cv2.INTER_CUBIC)
+
+
+def write_synthetic_packed(path, identities, samples, seed=0):
+    """Écrit une galerie synthétique au format empaqueté de dataset.py.
+
+    Retourne aussi une requête par identité, absente de la galerie, pour mesurer
+    la latence et la précision de la prédiction.
+    """
+    os.makedirs(path, exist_ok=True)
+    total = identities * samples
+    faces = np.lib.format.open_memmap(os.path.join(path, PACKED_FACES_FILE), mode='w+',
+                                      dtype=np.uint8, shape=(total, FACE_SIZE, FACE_SIZE))
+    labels = np.repeat(np.arange(identities, dtype=np.int32), samples)
+    queries = np.empty((identities, FACE_SIZE, FACE_SIZE), dtype=np.uint8)
+    rng = np.random.default_rng(seed)
+
+    for identity in range(identities):
+        field = identity_field(seed * 100003 + identity)
+        for sample in range(samples):
+            faces[identity * samples + sample] = synthetic_face(field, rng)
+        queries[identity] = synthetic_face(field, rng)
+
+    faces.flush()
+    del faces
+    np.save(os.path.join(path, PACKED_LABELS_FILE), labels)
+    with open(os.path.join(path, PACKED_INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            "version": 1,
+            "shape": [total, FACE_SIZE, FACE_SIZE],
+            "names": [f"person_{identity:05d}" for identity in range(identities)],
+            "files": []
+        }, f)
+    return queries
+
+
+def percentiles(latencies):
+    return {p: float(np.percentile(latencies, p)) for p in (50, 95, 99)}
+
+
+def median_row(rows):
+    """Médiane de chaque mesure sur plusieurs répétitions"""
+    row = dict(rows[0])
+    for metric in METRIC_DIRECTIONS:
+        if metric in row:
+            row[metric] = float(np.median([r[metric] for r in rows]))
+    row["repeats"] = len(rows)
+    return row
+
+
+def bench_gallery(identities, samples, backend, queries_count, seed, workdir):
+    """Entraîne, recharge puis interroge un système sur une galerie synthétique"""
+    import main
+
+    path = os.path.join(workdir, f"gallery_{identities}")
+    os.makedirs(path, exist_ok=True)
+    queries = write_synthetic_packed(os.path.join(path, "packed"), identities, samples, seed)
+
+    # Les messages d'entraînement (une ligne par personne) sont masqués
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        with redirect_stdout(io.StringIO()):
+            users_db = os.path.join(path, "users.db")
+            system = main.FaceRecognitionSystem(backend=backend, users_db=users_db)
+            start = time.perf_counter()
+            system.train_recognizer(full=True, packed="packed")
+            train_s = time.perf_counter() - start
+            system.registry.close()
+
+            start = time.perf_counter()
+            system = main.FaceRecognitionSystem(backend=backend, users_db=users_db)
+            load_s = time.perf_counter() - start
+            system.registry.close()
+    finally:
+        os.chdir(cwd)
+
+    name_to_id = {name: face_id for face_id, name in system.face_id_to_name.items()}
+    order = np.random.default_rng(seed).permutation(identities)[:queries_count]
+    latencies = []
+    correct = 0
+    for identity in order:
+        start = time.perf_counter()
+        face_id, _ = system.predict_faces(queries[identity:identity + 1])[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += face_id == name_to_id[f"person_{identity:05d}"]
+
+    shutil.rmtree(path, ignore_errors=True)
+    p = percentiles(latencies)
+    return {
+        "identities": identities,
+        "samples": samples,
+        "backend": backend,
+        "train_s": train_s,
+        "load_s": load_s,
+        "predict_ms_p50": p[50],
+        "predict_ms_p95": p[95],
+        "predict_ms_p99": p[99],
+        "predict_per_s": 1000.0 / float(np.mean(latencies)),
+        "accuracy": correct / len(order)
+    }
+
+
+def read_frames(source, count):
+    frames = []
+    if not source.open():
+        return frames
+    if hasattr(source, "fps") and not source.is_live:
+        source.fps = 1e6
+    while len(frames) < count:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+    return frames
+
+
+def bench_detection(system, source, count):
+    """Latence de détection (et de reconnaissance complète) sur les images d'une source"""
+    frames = read_frames(source, count)
+    if not frames:
+        return None
+
+    latencies = []
+    for frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        start = time.perf_counter()
+        system.detect_faces(gray)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    height, width = frames[0].shape[:2]
+    p = percentiles(latencies)
+    row = {
+        "source": str(source),
+        "resolution": f"{width}x{height}",
+        "frames": len(frames),
+        "detect_ms_p50": p[50],
+        "detect_ms_p95": p[95],
+        "detect_fps": 1000.0 / float(np.mean(latencies))
+    }
+
+    if system.is_trained:
+        latencies = []
+        for frame in frames:
+            start = time.perf_counter()
+            system.recognize_frame(frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+        p = percentiles(latencies)
+        row["recognize_ms_p50"] = p[50]
+        row["recognize_ms_p95"] = p[95]
+    return row
+
+
+def run_benchmark(sizes=(10, 100, 1000), samples=5, backend=None, queries=200,
+                  resolutions=((320, 240), (640, 480), (1280, 720)), frames=None,
+                  frame_count=30, seed=0, repeats=3):
+    workdir = tempfile.mkdtemp(prefix="face_bench_")
+    import main
+
+    backend = backend or main.RECOGNIZER_BACKEND
+    report = {
+        "version": BENCHMARK_VERSION,
+        "created": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {"sizes": list(sizes), "samples": samples, "backend": backend,
+                   "queries": queries, "seed": seed, "top_k": main.RECOGNIZER_TOP_K,
+                   "repeats": repeats},
+        "galleries": [],
+        "detection": []
+    }
+
+    try:
+        for identities in sizes:
+            print(f"\n⏱️  Galerie de {identities} personne(s) x {samples} échantillon(s)...")
+            rows = [bench_gallery(identities, samples, backend, queries, seed, workdir)
+                    for _ in range(repeats)]
+            report["galleries"].append(median_row(rows))
+
+        # Modèle du dossier courant (reconnaissance complète), avec un registre
+        # temporaire: celui d'un déploiement n'est pas touché
+        system = main.FaceRecognitionSystem(users_db=os.path.join(workdir, "users.db"))
+        sources = [SyntheticSource(width, height, frame_count, seed) for width, height in resolutions]
+        if frames:
+            sources.append(open_source(frames))
+        try:
+            for source in sources:
+                rows = [bench_detection(system, source, frame_count) for _ in range(repeats)]
+                rows = [row for row in rows if row is not None]
+                if rows:
+                    report["detection"].append(median_row(rows))
+        finally:
+            system.registry.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 Galeries ({report['config']['backend']})")
+    print(f"  {'personnes':>9} {'entr. s':>8} {'charg. s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'préd./s':>8} {'précision':>9}")
+    for row in report["galleries"]:
+        print(f"  {row['identities']:>9} {row['train_s']:>8.2f} {row['load_s']:>9.3f} "
+              f"{row['predict_ms_p50']:>8.2f} {row['predict_ms_p99']:>8.2f} "
+              f"{row['predict_per_s']:>8.1f} {row['accuracy'] * 100:>8.1f}%")
+
+    print("\n📊 Détection")
+    print(f"  {'source':>28} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>7}")
+    for row in report["detection"]:
+        print(f"  {row['source'][:28]:>28} {row['detect_ms_p50']:>8.2f} "
+              f"{row['detect_ms_p95']:>8.2f} {row['detect_fps']:>7.1f}")
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Liste des régressions par rapport à une référence (écart relatif > tolérance)"""
+    regressions = []
+    sections = (("galleries", lambda row: (row["identities"], row["backend"])),
+                ("detection", lambda row: row["source"]))
+    for section, key in sections:
+        reference = {key(row): row for row in baseline.get(section, [])}
+        for row in report.get(section, []):
+            base = reference.get(key(row))
+            if base is None:
+                continue
+            for metric, direction in METRIC_DIRECTIONS.items():
+                if metric in UNGATED_METRICS:
+                    continue
+                if metric not in row or metric not in base or not base[metric]:
+                    continue
+                change = (row[metric] - base[metric]) / abs(base[metric])
+                if change * direction < -tolerance:
+                    regressions.append({
+                        "section": section,
+                        "key": key(row),
+                        "metric": metric,
+                        "baseline": base[metric],
+                        "current": row[metric],
+                        "change": change
+                    })
+    return regressions
+
+
+def main_cli(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Banc d'essai de la reconnaissance faciale")
+    parser.add_argument("--sizes", default="10,100,1000", help="Tailles de galerie (personnes)")
+    parser.add_argument("--samples", type=int, default=5, help="Échantillons par personne")
+    parser.add_argument("--backend", choices=["numpy", "opencv"], help="Défaut: RECOGNIZER_BACKEND")
+    parser.add_argument("--queries", type=int, default=200, help="Prédictions mesurées par galerie")
+    parser.add_argument("--resolutions", default="320x240,640x480,1280x720")
+    parser.add_argument("--frames", help="Images enregistrées: vidéo ou dossier d'images")
+    parser.add_argument("--frame-count", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3, help="Répétitions par mesure (médiane)")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="Rapport de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Écart relatif toléré")
+    args = parser.parse_args(argv)
+
+    resolutions = [tuple(int(v) for v in r.split("x")) for r in args.resolutions.split(",") if r]
+    report = run_benchmark(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        samples=args.samples,
+        backend=args.backend,
+        queries=args.queries,
+        resolutions=resolutions,
+        frames=args.frames,
+        frame_count=args.frame_count,
+        seed=args.seed,
+        repeats=max(1, args.repeats)
+    )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Résultats écrits dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.tolerance * 100:.0f}%:")
+            for r in regressions:
+                print(f"  {r['section']} {r['key']}: {r['metric']} "
+                      f"{r['baseline']:.4g} -> {r['current']:.4g} ({r['change'] * 100:+.1f}%)")
+            return 1
+        print(f"\n✓ Aucune régression par rapport à {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
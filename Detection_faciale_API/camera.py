@@ -0,0 +1,265 @@
+import cv2
+import os
+import time
+import threading
+from collections import deque
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class DeviceSource:
+    """Source d'images: caméra locale (index de périphérique)"""
+    is_live = True
+
+    def __init__(self, index=0):
+        self.index = index
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.index)
+        if not self.cap.isOpened():
+            return False
+        # Garder le tampon du pilote minimal pour toujours lire l'image la plus récente
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return True
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        return self.cap.read()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def __repr__(self):
+        return f"DeviceSource({self.index})"
+
+
+class VideoFileSource:
+    """Source d'images: fichier vidéo enregistré, relu en boucle au rythme de la vidéo"""
+    is_live = False
+
+    def __init__(self, path, loop=True, fps=None):
+        self.path = path
+        self.loop = loop
+        self.fps = fps
+        self.cap = None
+        self.next_time = 0
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            return False
+        if not self.fps:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 15
+        self.next_time = time.monotonic()
+        return True
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        # Simuler une caméra réelle: une image par période
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_time = max(self.next_time, time.monotonic() - 1.0) + 1.0 / self.fps
+
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def __repr__(self):
+        return f"VideoFileSource({self.path!r})"
+
+
+class ImageDirectorySource:
+    """Source d'images: dossier d'images lues dans l'ordre alphabétique, en boucle"""
+    is_live = False
+
+    def __init__(self, path, loop=True, fps=15):
+        self.path = path
+        self.loop = loop
+        self.fps = fps
+        self.files = []
+        self.position = 0
+        self.next_time = 0
+
+    def open(self):
+        if not os.path.isdir(self.path):
+            return False
+        self.files = sorted(
+            os.path.join(self.path, f) for f in os.listdir(self.path)
+            if f.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.position = 0
+        self.next_time = time.monotonic()
+        return len(self.files) > 0
+
+    def read(self):
+        if self.position >= len(self.files):
+            if not self.loop or not self.files:
+                return False, None
+            self.position = 0
+
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_time = max(self.next_time, time.monotonic() - 1.0) + 1.0 / self.fps
+
+        frame = cv2.imread(self.files[self.position])
+        self.position += 1
+        return frame is not None, frame
+
+    def release(self):
+        self.files = []
+
+    def __repr__(self):
+        return f"ImageDirectorySource({self.path!r})"
+
+
+def open_source(spec):
+    """Construit une source d'images à partir d'une description.
+
+    - un entier (ou une chaîne de chiffres): index de caméra
+    - un dossier: images lues une à une
+    - un fichier ou une URL: vidéo lue par OpenCV
+    """
+    if isinstance(spec, (DeviceSource, VideoFileSource, ImageDirectorySource)):
+        return spec
+    if isinstance(spec, int):
+        return DeviceSource(spec)
+
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return DeviceSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec)
+    return VideoFileSource(spec)
+
+
+def parse_cameras(spec, default="0"):
+    """Lit la configuration des caméras: "entree=0,garage=rtsp://..." -> {id: source}.
+
+    Une entrée sans identifiant reçoit son rang ("0", "1", ...). Sans
+    configuration, une seule caméra "default" utilise la source `default`.
+    """
+    cameras = {}
+    for index, entry in enumerate(part.strip() for part in (spec or "").split(",")):
+        if not entry:
+            continue
+        camera_id, sep, source = entry.partition("=")
+        if not sep or "://" in camera_id:
+            camera_id, source = str(index), entry
+        cameras[camera_id.strip()] = source.strip()
+    return cameras or {"default": default}
+
+
+class CaptureService:
+    """Thread de capture permanent qui garde la caméra ouverte.
+
+    Les dernières images sont conservées avec leur horodatage dans un tampon
+    circulaire, de sorte qu'une requête lit immédiatement l'image la plus récente
+    au lieu d'ouvrir et de préchauffer la caméra à chaque appel. Une image plus
+    ancienne que `max_age` secondes (source perdue) n'est jamais retournée.
+    """
+
+    def __init__(self, source=0, buffer_size=8, reconnect_delay=1.0, max_age=2.0):
+        self.source = open_source(source)
+        self.frames = deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.reconnect_delay = reconnect_delay
+        self.max_age = max_age
+        self.running = False
+        self.thread = None
+        self.frame_count = 0
+        self.error = None
+
+    def start(self):
+        """Ouvre la source et démarre le thread de capture"""
+        if self.running:
+            return True
+
+        if not self.source.open():
+            self.error = "Camera error"
+            return False
+
+        self.error = None
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"capture-{self.source}", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Arrête le thread de capture et libère la source"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self.source.release()
+        with self.condition:
+            self.frames.clear()
+            self.condition.notify_all()
+
+    def _run(self):
+        failures = 0
+        while self.running:
+            ret, frame = self.source.read()
+            if not ret or frame is None:
+                failures += 1
+                if failures >= 10:
+                    # Source perdue: oublier ses images, puis tenter de la rouvrir
+                    self.error = "Frame capture error"
+                    with self.condition:
+                        self.frames.clear()
+                    self.source.release()
+                    time.sleep(self.reconnect_delay)
+                    if self.running and self.source.open():
+                        failures = 0
+                else:
+                    time.sleep(0.01)
+                continue
+
+            failures = 0
+            self.error = None
+            with self.condition:
+                self.frames.append((time.time(), frame))
+                self.frame_count += 1
+                self.condition.notify_all()
+
+    def latest(self, timeout=1.0):
+        """Retourne (timestamp, image) le plus récent, en attendant une image de moins de `max_age` s"""
+        return self.next_frame(after=time.time() - self.max_age, timeout=timeout)
+
+    def next_frame(self, after=0, timeout=1.0):
+        """Retourne la première image capturée strictement après le timestamp `after`"""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: (self.frames and self.frames[-1][0] > after) or not self.running,
+                timeout=timeout
+            )
+            if not self.frames or self.frames[-1][0] <= after:
+                return None, None
+            return self.frames[-1]
+
+    def recent(self, count=None):
+        """Retourne les dernières images du tampon, de la plus ancienne à la plus récente"""
+        oldest = time.time() - self.max_age
+        with self.condition:
+            frames = [(timestamp, frame) for timestamp, frame in self.frames if timestamp > oldest]
+        if count is not None:
+            frames = frames[-count:]
+        return frames
+
+    def valid(self, frame):
+        """Les images du tampon ne sont jamais réécrites (voir RingCapture.valid)"""
+        return True
@@ -0,0 +1,308 @@
+import cv2
+import numpy as np
+import os
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Format compact: un seul tableau uint8 N×200×200 ouvert en memmap + un index
+PACKED_FACES_FILE = "faces.npy"
+PACKED_LABELS_FILE = "labels.npy"
+PACKED_INDEX_FILE = "index.json"
+FACE_SIZE = 200
+
+
+class SampleCache:
+    """Cache disque des échantillons décodés en niveaux de gris, au format empaqueté.
+
+    - faces.<n>.npy: tableau uint8 N×200×200 ouvert avec numpy.memmap
+    - index.json: {chemin: [mtime, taille, ligne]} et le nom du fichier faces
+
+    Chaque entrée est validée par la date de modification et la taille du
+    fichier: un fichier inchangé n'est jamais redécodé. Rien n'est lu à la
+    construction, seulement au premier accès, et les images servies sont des
+    vues memmap (pages partagées, non copiées dans chaque processus).
+    """
+
+    def __init__(self, path="training_cache"):
+        self.path = path
+        self.entries = None  # chemin -> (mtime, taille, ligne de faces ou image ajoutée)
+        self.faces = None
+        self.faces_file = None
+        self.dirty = False
+
+    def load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        index_file = os.path.join(self.path, PACKED_INDEX_FILE) if self.path else None
+        if not index_file or not os.path.exists(index_file):
+            return
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.faces_file = index["faces"]
+            self.faces = np.load(os.path.join(self.path, self.faces_file), mmap_mode='r')
+            self.entries = {path: (mtime, size, row) for path, (mtime, size, row) in index["entries"].items()
+                            if row < len(self.faces)}
+        except Exception:
+            print("⚠️  Cache d'échantillons illisible, il sera reconstruit")
+            self.entries = {}
+            self.faces = self.faces_file = None
+            self.dirty = True
+
+    def save(self):
+        """Réécrit le cache: nouveau fichier faces, puis index remplacé atomiquement"""
+        if not self.dirty or not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        paths = list(self.entries)
+        generation = int(self.faces_file.split(".")[1]) + 1 if self.faces_file else 0
+        faces_file = f"faces.{generation}.npy"
+        faces = np.lib.format.open_memmap(
+            os.path.join(self.path, faces_file), mode='w+',
+            dtype=np.uint8, shape=(len(paths), FACE_SIZE, FACE_SIZE)
+        )
+        entries = {}
+        for row, path in enumerate(paths):
+            mtime, size, img = self.entries[path]
+            faces[row] = self.faces[img] if isinstance(img, int) else img
+            entries[path] = (mtime, size, row)
+        faces.flush()
+        del faces
+
+        tmp_file = os.path.join(self.path, PACKED_INDEX_FILE + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "faces": faces_file, "entries": entries}, f)
+        os.replace(tmp_file, os.path.join(self.path, PACKED_INDEX_FILE))
+        # Les vues déjà servies gardent l'ancien fichier ouvert jusqu'à leur libération
+        if self.faces_file:
+            try:
+                os.remove(os.path.join(self.path, self.faces_file))
+            except OSError:
+                pass
+        self.faces_file = faces_file
+        self.faces = np.load(os.path.join(self.path, faces_file), mmap_mode='r')
+        self.entries = entries
+        self.dirty = False
+
+    def get(self, path, mtime, size):
+        self.load()
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != mtime or entry[1] != size:
+            return None
+        return self.faces[entry[2]] if isinstance(entry[2], int) else entry[2]
+
+    def put(self, path, mtime, size, img):
+        # Seuls les échantillons 200×200 (ceux de training_data) tiennent dans le tableau
+        if img.shape != (FACE_SIZE, FACE_SIZE):
+            return
+        self.load()
+        self.entries[path] = (mtime, size, img)
+        self.dirty = True
+
+    def prune(self, valid_paths):
+        """Oublie les fichiers qui n'existent plus"""
+        self.load()
+        stale = [path for path in self.entries if path not in valid_paths]
+        for path in stale:
+            del self.entries[path]
+        if stale:
+            self.dirty = True
+
+
+class SampleWriter:
+    """Écrit les échantillons JPEG dans un thread, sans bloquer la boucle qui les produit.
+
+    La file est bornée: si le disque ne suit pas, put() attend. `written[clé]`
+    donne le nombre d'échantillons et d'octets écrits par clé (ex. ID utilisateur).
+    """
+
+    def __init__(self, max_pending=256):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.written = {}
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, name="sample-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, path, img, key=None):
+        self.queue.put((path, img, key))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            path, img, key = item
+            ok, data = cv2.imencode(".jpg", img)
+            if not ok:
+                self.errors += 1
+                continue
+            with open(path, 'wb') as f:
+                f.write(data.tobytes())
+            count, size = self.written.get(key, (0, 0))
+            self.written[key] = (count + 1, size + len(data))
+
+    def close(self):
+        """Attend l'écriture de tous les échantillons en file"""
+        self.queue.put(None)
+        self.thread.join()
+        return self.written
+
+
+def scan_training_data(folder="training_data"):
+    """Liste les échantillons par personne: {nom: [(chemin, mtime, taille), ...]}"""
+    people = {}
+    if not os.path.exists(folder):
+        return people
+
+    for person in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not person.is_dir():
+            continue
+        files = []
+        for entry in sorted(os.scandir(person.path), key=lambda e: e.name):
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_mtime_ns, stat.st_size))
+        people[person.name] = files
+    return people
+
+
+def decode_sample(path):
+    return cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+
+
+def load_training_data(folder="training_data", cache=None, workers=None, with_paths=False):
+    """Charge les échantillons de training_data en parallèle.
+
+    Retourne {nom: [image, ...]} (ou [(chemin, image), ...] avec with_paths)
+    ainsi que le nombre d'images décodées (les autres proviennent du cache).
+    """
+    people = scan_training_data(folder)
+    images = {name: [None] * len(files) for name, files in people.items()}
+
+    # Servir depuis le cache ce qui n'a pas changé
+    to_decode = []
+    for name, files in people.items():
+        for index, (path, mtime, size) in enumerate(files):
+            img = cache.get(path, mtime, size) if cache is not None else None
+            if img is None:
+                to_decode.append((name, index, path, mtime, size))
+            else:
+                images[name][index] = img
+
+    # cv2.imread libère le GIL: un pool de threads suffit à occuper tous les cœurs
+    if to_decode:
+        workers = workers or os.cpu_count() or 4
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            decoded = executor.map(decode_sample, [item[2] for item in to_decode])
+            for (name, index, path, mtime, size), img in zip(to_decode, decoded):
+                images[name][index] = img
+                if img is not None and cache is not None:
+                    cache.put(path, mtime, size, img)
+
+    if cache is not None:
+        cache.prune({path for files in people.values() for path, _, _ in files})
+        cache.save()
+
+    samples = {}
+    for name, files in people.items():
+        pairs = [(path, img) for (path, _, _), img in zip(files, images[name]) if img is not None]
+        samples[name] = pairs if with_paths else [img for _, img in pairs]
+    return samples, len(to_decode)
+
+
+class PackedDataset:
+    """Jeu d'échantillons empaqueté, lu sans aucun décodage JPEG.
+
+    - faces.npy: tableau uint8 N×200×200 ouvert avec numpy.memmap
+    - labels.npy: index de la personne (int32) pour chaque échantillon
+    - index.json: noms des personnes et fichiers d'origine
+    """
+
+    def __init__(self, path="packed_data"):
+        self.path = path
+        with open(os.path.join(path, PACKED_INDEX_FILE), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.names = self.index["names"]
+        self.files = self.index.get("files", [])
+        self.faces = np.load(os.path.join(path, PACKED_FACES_FILE), mmap_mode='r')
+        self.labels = np.load(os.path.join(path, PACKED_LABELS_FILE), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.labels)
+
+    def by_person(self):
+        """Retourne {nom: vue (n, 200, 200) sur les échantillons de la personne}"""
+        labels = np.asarray(self.labels)
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(len(self.names) + 1))
+        people = {}
+        for label, name in enumerate(self.names):
+            indices = order[bounds[label]:bounds[label + 1]]
+            if len(indices) == 0:
+                continue
+            # Échantillons d'une même personne contigus: vue memmap sans copie
+            if indices[-1] - indices[0] + 1 == len(indices) and np.all(np.diff(indices) == 1):
+                people[name] = self.faces[indices[0]:indices[-1] + 1]
+            else:
+                people[name] = self.faces[indices]
+        return people
+
+
+def export_packed(folder="training_data", output="packed_data", cache=None):
+    """Convertit training_data/<personne>/*.jpg vers le format empaqueté"""
+    samples, _ = load_training_data(folder, cache=cache, with_paths=True)
+    names = list(samples.keys())
+    total = sum(len(images) for images in samples.values())
+
+    os.makedirs(output, exist_ok=True)
+    faces = np.lib.format.open_memmap(
+        os.path.join(output, PACKED_FACES_FILE), mode='w+',
+        dtype=np.uint8, shape=(total, FACE_SIZE, FACE_SIZE)
+    )
+    labels = np.empty(total, dtype=np.int32)
+    files = []
+
+    position = 0
+    for label, name in enumerate(names):
+        for path, img in samples[name]:
+            if img.shape != (FACE_SIZE, FACE_SIZE):
+                img = cv2.resize(img, (FACE_SIZE, FACE_SIZE))
+            faces[position] = img
+            labels[position] = label
+            files.append(os.path.relpath(path, folder))
+            position += 1
+
+    faces.flush()
+    del faces
+    np.save(os.path.join(output, PACKED_LABELS_FILE), labels)
+    with open(os.path.join(output, PACKED_INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            "version": 1,
+            "shape": [total, FACE_SIZE, FACE_SIZE],
+            "names": names,
+            "files": files
+        }, f)
+
+    return total, len(names)
+
+
+def import_packed(packed="packed_data", folder="training_data"):
+    """Reconvertit un jeu empaqueté vers training_data/<personne>/*.jpg"""
+    dataset = PackedDataset(packed)
+    count = 0
+    for index in range(len(dataset)):
+        name = dataset.names[int(dataset.labels[index])]
+        if index < len(dataset.files):
+            filename = os.path.join(folder, dataset.files[index])
+        else:
+            filename = os.path.join(folder, name, f"{name}_{index}.jpg")
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        cv2.imwrite(filename, np.asarray(dataset.faces[index]))
+        count += 1
+    return count, len(dataset.names)
@@ -0,0 +1,131 @@
+import numpy as np
+import os
+import shutil
+import time
+from dataset import load_training_data
+from lbp_index import LBPHIndex
+
+
+class SampleSelector:
+    """Garde un échantillon seulement s'il diffère assez de ceux déjà gardés.
+
+    La différence est la distance chi-carré LBPH (celle du recognizer) entre
+    l'histogramme du candidat et le plus proche des histogrammes gardés. Deux
+    images successives d'une personne immobile sont à ~15-25; deux personnes
+    différentes au-delà de 70. `min_distance` <= 0 garde tout.
+    """
+
+    def __init__(self, min_distance=25.0):
+        self.min_distance = min_distance
+        self.index = LBPHIndex()
+
+    def __len__(self):
+        return self.index.count
+
+    def seed(self, images):
+        """Échantillons déjà enregistrés: gardés d'office, servent de référence"""
+        if len(images):
+            histograms = self.index.compute_histograms(images)
+            self.index.add_histograms(histograms, np.zeros(len(histograms), dtype=np.int32))
+
+    def accept(self, image):
+        """Retourne (gardé, distance au plus proche échantillon gardé)"""
+        return self.accept_histogram(self.index.compute_histograms(np.asarray(image)[None])[0])
+
+    def accept_histogram(self, histogram):
+        distance = float(self.index.distances(histogram).min()) if self.index.count else float("inf")
+        keep = self.min_distance <= 0 or distance >= self.min_distance
+        if keep:
+            self.index.add_histograms(histogram[None], np.zeros(1, dtype=np.int32))
+        return keep, distance
+
+
+def select_diverse(histograms, min_distance=25.0):
+    """Indices des histogrammes gardés, dans l'ordre, par sélection gloutonne"""
+    selector = SampleSelector(min_distance)
+    return [index for index, histogram in enumerate(histograms)
+            if selector.accept_histogram(histogram)[0]]
+
+
+def _predict_ms(index, queries, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / max(len(queries), 1)
+
+
+def dedupe_training_data(folder="training_data", min_distance=25.0, apply=False,
+                         pruned_folder="training_data_pruned", cache=None, queries=200, seed=0):
+    """Élague les quasi-doublons de training_data/<personne>/ et mesure le gain.
+
+    Sans `apply`, rien n'est modifié (simulation). Avec `apply`, les échantillons
+    écartés sont déplacés vers `pruned_folder` (même arborescence), pas supprimés.
+    Le rapport compare la galerie complète et la galerie élaguée: nombre
+    d'échantillons, latence de prédiction sur les mêmes requêtes, et part des
+    échantillons écartés encore reconnus (bonne personne, distance < 70).
+    """
+    samples, _ = load_training_data(folder, cache=cache, with_paths=True)
+    encoder = LBPHIndex()
+    histograms, labels, kept, removed = [], [], [], []
+    people = {}
+
+    for label, (name, pairs) in enumerate(samples.items()):
+        if not pairs:
+            continue
+        person = encoder.compute_histograms([img for _, img in pairs])
+        keep = select_diverse(person, min_distance)
+        keep_set = set(keep)
+        offset = len(labels)
+        histograms.append(person)
+        labels.extend([label] * len(pairs))
+        kept.extend(offset + i for i in keep)
+        removed.extend((offset + i, pairs[i][0]) for i in range(len(pairs)) if i not in keep_set)
+        people[name] = {"before": len(pairs), "after": len(keep)}
+        print(f"  {name}: {len(pairs)} -> {len(keep)} échantillons")
+
+    if not labels:
+        print("❌ Aucune donnée d'entraînement trouvée!")
+        return None
+
+    histograms = np.concatenate(histograms)
+    labels = np.asarray(labels, dtype=np.int32)
+    full = LBPHIndex()
+    full.add_histograms(histograms, labels)
+    pruned = LBPHIndex()
+    pruned.add_histograms(histograms[kept], labels[kept])
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(labels), size=min(queries, len(labels)), replace=False)
+    still_recognized = 0
+    for row, _ in removed:
+        label, distance = pruned.search(histograms[row])
+        still_recognized += label == labels[row] and distance < 70
+
+    report = {
+        "min_distance": min_distance,
+        "people": people,
+        "gallery_before": len(labels),
+        "gallery_after": len(kept),
+        "predict_ms_before": _predict_ms(full, histograms[sample]),
+        "predict_ms_after": _predict_ms(pruned, histograms[sample]),
+        "removed_recognized": still_recognized / len(removed) if removed else 1.0,
+        "applied": apply
+    }
+
+    print(f"\n📉 Galerie: {report['gallery_before']} -> {report['gallery_after']} échantillons "
+          f"(-{(1 - report['gallery_after'] / report['gallery_before']) * 100:.0f}%)")
+    print(f"  Prédiction: {report['predict_ms_before']:.2f} ms -> {report['predict_ms_after']:.2f} ms")
+    print(f"  Échantillons écartés encore reconnus: {report['removed_recognized'] * 100:.1f}%")
+
+    if apply:
+        for _, path in removed:
+            target = os.path.join(pruned_folder, os.path.relpath(path, folder))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        print(f"✓ {len(removed)} échantillon(s) déplacé(s) vers {pruned_folder}")
+    else:
+        print("  Simulation: relancer avec --apply pour déplacer les doublons")
+    return report
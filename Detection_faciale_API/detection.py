@@ -0,0 +1,381 @@
+import cv2
+import numpy as np
+import os
+import json
+import time
+import threading
+from camera import open_source, IMAGE_EXTENSIONS
+
+
+class CascadeDetector:
+    """Détecteur OpenCV à cascade (Haar ou LBP).
+
+    `file` est un chemin local ou le nom d'une cascade livrée avec OpenCV
+    (cv2.data.haarcascades). detectMultiScale n'est pas thread-safe: chaque
+    thread a sa propre instance de la cascade.
+    """
+
+    def __init__(self, file="haarcascade_frontalface_default.xml", scale_factor=1.3, min_neighbors=5):
+        if not os.path.exists(file):
+            file = os.path.join(cv2.data.haarcascades, file)
+        self.file = file
+        self.scale_factor = float(scale_factor)
+        self.min_neighbors = int(min_neighbors)
+        self.main_cascade = self._load()
+        self.thread_local = threading.local()
+
+    def _load(self):
+        cascade = cv2.CascadeClassifier(self.file)
+        if cascade.empty():
+            raise ValueError(f"Cascade illisible: {self.file}")
+        return cascade
+
+    def _cascade(self):
+        if threading.current_thread() is threading.main_thread():
+            return self.main_cascade
+        cascade = getattr(self.thread_local, "cascade", None)
+        if cascade is None:
+            cascade = self.thread_local.cascade = self._load()
+        return cascade
+
+    def detect(self, gray, min_size=(0, 0), max_size=None):
+        return self._cascade().detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=min_size,
+            maxSize=max_size or (0, 0)
+        )
+
+
+class DnnDetector:
+    """Détecteur SSD OpenCV DNN sur CPU, chargé depuis un fichier local.
+
+    Prévu pour le modèle res10_300x300_ssd_iter_140000 (Caffe: `model` .caffemodel
+    + `config` deploy.prototxt), ou tout SSD de même sortie (N, 7) lisible par
+    cv2.dnn.readNet. Un réseau par thread (forward n'est pas réentrant).
+    """
+
+    def __init__(self, model, config="", confidence=0.5, size=300, mean=(104.0, 177.0, 123.0)):
+        if not os.path.exists(model):
+            raise ValueError(f"Modèle DNN introuvable: {model}")
+        self.model = model
+        self.config = config
+        self.confidence = float(confidence)
+        self.size = int(size)
+        self.mean = mean
+        self.main_net = self._load()
+        self.thread_local = threading.local()
+
+    def _load(self):
+        net = cv2.dnn.readNet(self.model, self.config)
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        return net
+
+    def _net(self):
+        if threading.current_thread() is threading.main_thread():
+            return self.main_net
+        net = getattr(self.thread_local, "net", None)
+        if net is None:
+            net = self.thread_local.net = self._load()
+        return net
+
+    def detect(self, gray, min_size=(0, 0), max_size=None):
+        height, width = gray.shape[:2]
+        image = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR) if gray.ndim == 2 else gray
+        blob = cv2.dnn.blobFromImage(image, 1.0, (self.size, self.size), self.mean)
+        net = self._net()
+        net.setInput(blob)
+        detections = net.forward().reshape(-1, 7)
+
+        boxes = []
+        for confidence, x0, y0, x1, y1 in detections[:, 2:7]:
+            if confidence < self.confidence:
+                continue
+            x0, y0 = max(0, int(x0 * width)), max(0, int(y0 * height))
+            x1, y1 = min(width, int(x1 * width)), min(height, int(y1 * height))
+            w, h = x1 - x0, y1 - y0
+            if w < min_size[0] or h < min_size[1] or w <= 0 or h <= 0:
+                continue
+            if max_size and (w > max_size[0] or h > max_size[1]):
+                continue
+            boxes.append((x0, y0, w, h))
+        return boxes
+
+
+# Noms courts des détecteurs usuels
+DETECTOR_PRESETS = {
+    "haar": "cascade:file=haarcascade_frontalface_default.xml",
+    "haar-alt": "cascade:file=haarcascade_frontalface_alt.xml",
+    "haar-alt2": "cascade:file=haarcascade_frontalface_alt2.xml",
+    "haar-alt-tree": "cascade:file=haarcascade_frontalface_alt_tree.xml"
+}
+
+DETECTOR_KINDS = {"cascade": CascadeDetector, "dnn": DnnDetector}
+
+
+def create_detector(spec="haar"):
+    """Crée un détecteur depuis sa description: "haar", "haar-alt2",
+    "cascade:file=lbpcascade_frontalface_improved.xml,min_neighbors=4" ou
+    "dnn:model=res10.caffemodel,config=deploy.prototxt,confidence=0.6".
+    """
+    spec = DETECTOR_PRESETS.get(spec.strip(), spec.strip())
+    kind, _, options = spec.partition(":")
+    if kind not in DETECTOR_KINDS:
+        raise ValueError(f"Détecteur inconnu: {kind}")
+    params = {}
+    for option in filter(None, (part.strip() for part in options.split(","))):
+        key, sep, value = option.partition("=")
+        if not sep:
+            raise ValueError(f"Option de détecteur invalide: {option}")
+        params[key.strip()] = value.strip()
+    return DETECTOR_KINDS[kind](**params)
+
+
+def parse_detectors(spec):
+    """Lit les détecteurs par caméra: "entree=haar;garage=dnn:model=..." -> {id: description}"""
+    detectors = {}
+    for entry in filter(None, (part.strip() for part in (spec or "").split(";"))):
+        camera_id, sep, detector = entry.partition("=")
+        if not sep:
+            raise ValueError(f"Détecteur sans caméra: {entry}")
+        detectors[camera_id.strip()] = detector.strip()
+    return detectors
+
+
+class FaceTracker:
+    """Suivi des visages par région d'intérêt (ROI) entre images successives.
+
+    Après une première détection sur l'image complète, les images suivantes ne
+    sont analysées que dans une zone élargie autour des derniers rectangles. Une
+    recherche complète est refaite à cadence fixe, quand le suivi est perdu, ou
+    quand la dernière détection est trop ancienne. Dans la ROI, seules les
+    échelles proches de la taille du visage suivi sont explorées. `full` force
+    la recherche complète (mode multi-visages: un nouveau visage hors des ROI
+    ne serait jamais trouvé).
+    """
+
+    def __init__(self, detect_fn, margin=0.5, scale_range=1.5, full_every=15, max_age=1.0):
+        self.detect_fn = detect_fn      # detect_fn(gray, min_size=None, max_size=None) -> [(x, y, w, h)]
+        self.margin = margin            # élargissement de la ROI (fraction de la taille du visage)
+        self.scale_range = scale_range  # écart de taille toléré d'une image à l'autre
+        self.full_every = full_every    # recherche complète toutes les N images
+        self.max_age = max_age          # secondes au-delà desquelles la piste est périmée
+        self.boxes = []
+        self.frames_since_full = 0
+        self.last_time = 0
+        self.full_searches = 0
+        self.roi_searches = 0
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.boxes = []
+            self.frames_since_full = 0
+
+    def detect(self, gray, full=False):
+        """Retourne les visages de l'image, en cherchant d'abord autour des derniers"""
+        with self.lock:
+            now = time.monotonic()
+            stale = now - self.last_time > self.max_age
+            self.last_time = now
+
+            if not full and self.boxes and not stale and self.frames_since_full < self.full_every:
+                faces = self._search_rois(gray)
+                if faces:
+                    self.roi_searches += 1
+                    self.frames_since_full += 1
+                    self.boxes = faces
+                    return faces
+
+            # Pas de piste, piste perdue, recherche périodique ou forcée: image complète
+            faces = [tuple(int(v) for v in box) for box in self.detect_fn(gray)]
+            self.full_searches += 1
+            self.frames_since_full = 0
+            self.boxes = faces
+            return faces
+
+    def _search_rois(self, gray):
+        height, width = gray.shape[:2]
+        faces = []
+        for (x, y, w, h) in self.boxes:
+            dx, dy = int(w * self.margin), int(h * self.margin)
+            x0, y0 = max(0, x - dx), max(0, y - dy)
+            x1, y1 = min(width, x + w + dx), min(height, y + h + dy)
+            roi = gray[y0:y1, x0:x1]
+            min_size = (int(w / self.scale_range), int(h / self.scale_range))
+            max_size = (int(w * self.scale_range), int(h * self.scale_range))
+            for (rx, ry, rw, rh) in self.detect_fn(roi, min_size=min_size, max_size=max_size):
+                box = (int(rx) + x0, int(ry) + y0, int(rw), int(rh))
+                # Deux ROI qui se recouvrent peuvent retrouver le même visage
+                if not any(_overlaps(box, other) for other in faces):
+                    faces.append(box)
+        return faces
+
+    def stats(self):
+        total = self.full_searches + self.roi_searches
+        return {
+            "full_searches": self.full_searches,
+            "roi_searches": self.roi_searches,
+            "roi_ratio": self.roi_searches / total if total else 0.0
+        }
+
+
+def _overlaps(a, b):
+    """Vrai si le centre de `a` tombe dans le rectangle `b`"""
+    cx, cy = a[0] + a[2] / 2, a[1] + a[3] / 2
+    return b[0] <= cx <= b[0] + b[2] and b[1] <= cy <= b[1] + b[3]
+
+
+def detection_latency_report(detect_fn, source, scales=(1.0, 0.75, 0.5, 0.33), num_frames=50):
+    """Mesure la latence de détection pour chaque échelle sur les images d'une source.
+
+    Le rappel est relatif à la pleine résolution: part des images où un visage
+    est trouvé à cette échelle parmi celles où il l'est en pleine résolution.
+    """
+    frames = []
+    source = open_source(source)
+    if not source.open():
+        print(f"❌ Impossible d'ouvrir la source {source}")
+        return []
+    # Les sources enregistrées sont lues sans attendre leur cadence
+    if hasattr(source, "fps") and not source.is_live:
+        source.fps = 1e6
+    while len(frames) < num_frames:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame)
+    source.release()
+
+    if not frames:
+        print("❌ Aucune image lue")
+        return []
+
+    height, width = frames[0].shape[:2]
+    reference = [len(detect_fn(gray, scale=1.0)) > 0 for gray in frames]
+    reference_count = sum(reference)
+
+    rows = []
+    for scale in scales:
+        latencies = []
+        found = 0
+        for gray, expected in zip(frames, reference):
+            start = time.perf_counter()
+            faces = detect_fn(gray, scale=scale)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if expected and len(faces) > 0:
+                found += 1
+        rows.append({
+            "scale": scale,
+            "resolution": f"{int(width * scale)}x{int(height * scale)}",
+            "ms_mean": float(np.mean(latencies)),
+            "ms_p95": float(np.percentile(latencies, 95)),
+            "recall": found / reference_count if reference_count else 0.0
+        })
+
+    print(f"\n📏 Latence de détection ({len(frames)} images {width}x{height}, "
+          f"{reference_count} avec visage en pleine résolution)")
+    print(f"  {'échelle':>8} {'résolution':>12} {'moy. ms':>9} {'p95 ms':>9} {'rappel':>8}")
+    for row in rows:
+        print(f"  {row['scale']:>8.2f} {row['resolution']:>12} {row['ms_mean']:>9.2f} "
+              f"{row['ms_p95']:>9.2f} {row['recall'] * 100:>7.1f}%")
+    return rows
+
+
+def _iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+def load_labelled_images(folder):
+    """Images annotées: `folder`/labels.json {"image.jpg": [[x, y, w, h], ...], ...}.
+
+    Une image du dossier absente de labels.json ne contient aucun visage.
+    """
+    with open(os.path.join(folder, "labels.json"), 'r', encoding='utf-8') as f:
+        labels = json.load(f)
+    images = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        gray = cv2.imread(os.path.join(folder, name), cv2.IMREAD_GRAYSCALE)
+        if gray is not None:
+            images.append((name, gray, [tuple(box) for box in labels.get(name, [])]))
+    return images
+
+
+def compare_detectors(detect_fns, folder, recall_target=0.9, iou=0.4, repeat=2):
+    """Compare le coût et le rappel de plusieurs détecteurs sur des images annotées.
+
+    `detect_fns` associe un nom à une fonction gray -> rectangles. Un visage
+    annoté est retrouvé si un rectangle détecté le recouvre avec un IoU >= `iou`;
+    les autres rectangles sont des faux positifs. Chaque image est traitée
+    `repeat` fois (la plus rapide compte). Le détecteur recommandé est le moins
+    coûteux dont le rappel atteint `recall_target`.
+    """
+    images = load_labelled_images(folder)
+    if not images:
+        print(f"❌ Aucune image annotée dans {folder}")
+        return []
+    expected = sum(len(boxes) for _, _, boxes in images)
+
+    rows = []
+    for name, detect_fn in detect_fns.items():
+        latencies = []
+        found = 0
+        false_positives = 0
+        for _, gray, truth in images:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                faces = [tuple(int(v) for v in box) for box in detect_fn(gray)]
+                best = min(best, time.perf_counter() - start)
+            latencies.append(best * 1000)
+
+            unmatched = list(faces)
+            for box in truth:
+                match = max(unmatched, key=lambda face: _iou(box, face), default=None)
+                if match is not None and _iou(box, match) >= iou:
+                    found += 1
+                    unmatched.remove(match)
+            false_positives += len(unmatched)
+
+        rows.append({
+            "detector": name,
+            "ms_mean": float(np.mean(latencies)),
+            "ms_p95": float(np.percentile(latencies, 95)),
+            "recall": found / expected if expected else 0.0,
+            "false_positives": false_positives
+        })
+
+    print(f"\n📏 Comparaison des détecteurs ({len(images)} images, {expected} visages annotés)")
+    print(f"  {'détecteur':>24} {'moy. ms':>9} {'p95 ms':>9} {'rappel':>8} {'faux +':>7}")
+    for row in rows:
+        print(f"  {row['detector'][:24]:>24} {row['ms_mean']:>9.2f} {row['ms_p95']:>9.2f} "
+              f"{row['recall'] * 100:>7.1f}% {row['false_positives']:>7}")
+
+    eligible = [row for row in rows if row["recall"] >= recall_target]
+    if eligible:
+        choice = min(eligible, key=lambda row: row["ms_mean"])
+        print(f"\n✓ Détecteur le moins coûteux avec un rappel >= {recall_target * 100:.0f}%: "
+              f"{choice['detector']} ({choice['ms_mean']:.2f} ms/image)")
+    else:
+        print(f"\n⚠️  Aucun détecteur n'atteint un rappel de {recall_target * 100:.0f}%")
+    return rows
+
+
+def crop_faces(gray, boxes, size=200):
+    """Recadre et redimensionne tous les visages dans un seul lot uint8 (N, size, size).
+
+    Chaque visage est redimensionné directement dans le tableau préalloué, prêt à
+    être passé en une fois à la prédiction.
+    """
+    faces = np.empty((len(boxes), size, size), dtype=np.uint8)
+    for index, (x, y, w, h) in enumerate(boxes):
+        cv2.resize(gray[y:y+h, x:x+w], (size, size), dst=faces[index])
+    return faces
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+import os
+import time
+from camera import VideoFileSource, ImageDirectorySource, IMAGE_EXTENSIONS
+from detection import create_detector, crop_faces
+from dedupe import SampleSelector
+from dataset import FACE_SIZE
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+
+
+def discover_sources(paths):
+    """Sources d'enrôlement par personne: liste de (nom, chemin).
+
+    Chaque argument est soit "nom=chemin" (une vidéo ou un dossier de photos),
+    soit un dossier racine où chaque vidéo <nom>.mp4 et chaque sous-dossier
+    <nom>/ (photos, et/ou vidéos de cette personne) est une personne.
+    """
+    sources = []
+    for path in paths:
+        name, sep, target = path.partition("=")
+        if sep and not os.path.exists(path):
+            sources.append((name.strip(), target.strip()))
+            continue
+        if not os.path.isdir(path):
+            raise ValueError(f"Source d'enrôlement introuvable: {path}")
+
+        for entry in sorted(os.scandir(path), key=lambda e: e.name):
+            stem, extension = os.path.splitext(entry.name)
+            if entry.is_file() and extension.lower() in VIDEO_EXTENSIONS:
+                sources.append((stem, entry.path))
+            elif entry.is_dir():
+                files = sorted(os.listdir(entry.path))
+                if any(f.lower().endswith(IMAGE_EXTENSIONS) for f in files):
+                    sources.append((entry.name, entry.path))
+                sources.extend((entry.name, os.path.join(entry.path, f)) for f in files
+                               if f.lower().endswith(VIDEO_EXTENSIONS))
+    return sources
+
+
+def extract_faces(name, path, detector="haar", num_samples=30, every=3, min_distance=25.0, min_size=100):
+    """Détecte et recadre les visages d'une vidéo ou d'un dossier de photos (processus enfant).
+
+    Dans une vidéo, une image sur `every` est analysée; chaque photo d'un dossier
+    l'est. Le plus grand visage de l'image est gardé s'il n'est pas un
+    quasi-doublon d'un visage déjà gardé, jusqu'à `num_samples` visages.
+    """
+    start = time.time()
+    result = {"name": name, "path": path, "faces": None, "frames": 0, "seconds": 0.0, "error": None}
+    # Lecture sans attente: la cadence de la vidéo n'a pas d'importance ici
+    if os.path.isdir(path):
+        source, every = ImageDirectorySource(path, loop=False, fps=1e6), 1
+    else:
+        source = VideoFileSource(path, loop=False, fps=1e6)
+    if not source.open():
+        result["error"] = "Source illisible"
+        return result
+
+    face_detector = create_detector(detector)
+    selector = SampleSelector(min_distance)
+    faces = []
+    try:
+        while len(faces) < num_samples:
+            ret, frame = source.read()
+            if not ret or frame is None:
+                break
+            result["frames"] += 1
+            if (result["frames"] - 1) % every:
+                continue
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            boxes = face_detector.detect(gray, (min_size, min_size))
+            if len(boxes) == 0:
+                continue
+            box = tuple(int(v) for v in max(boxes, key=lambda b: b[2] * b[3]))
+            face = crop_faces(gray, [box], FACE_SIZE)[0]
+            if selector.accept(face)[0]:
+                faces.append(face)
+    finally:
+        source.release()
+
+    result["faces"] = np.stack(faces) if faces else np.empty((0, FACE_SIZE, FACE_SIZE), dtype=np.uint8)
+    result["seconds"] = time.time() - start
+    return result
@@ -0,0 +1,318 @@
+import numpy as np
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from multiprocessing import shared_memory
+from camera import CaptureService
+
+
+# En-tête de l'anneau: numéro de séquence et horodatage de chaque case, puis dernier numéro écrit
+HEADER_ALIGN = 64
+
+
+class FrameRing:
+    """Anneau d'images en mémoire partagée, un seul écrivain et plusieurs lecteurs.
+
+    Chaque case contient une image (H, W, C) uint8 et porte le numéro de la
+    dernière image écrite (-1 pendant l'écriture). Un lecteur obtient une vue
+    NumPy sur la case, sans copie; `valid(seq)` indique si elle n'a pas été
+    réécrite depuis. Avec assez de cases, une image reste stable plus longtemps
+    que sa conversion en niveaux de gris.
+    """
+
+    def __init__(self, name=None, shape=(480, 640, 3), slots=16, create=False):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        header_bytes = -(-(16 * slots + 8) // HEADER_ALIGN) * HEADER_ALIGN
+        self.owner = create
+        if create:
+            self.memory = shared_memory.SharedMemory(
+                name=name, create=True, size=header_bytes + frame_bytes * slots)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+
+        buffer = self.memory.buf
+        self.sequences = np.ndarray((slots,), dtype=np.int64, buffer=buffer, offset=0)
+        self.timestamps = np.ndarray((slots,), dtype=np.float64, buffer=buffer, offset=8 * slots)
+        self.head = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=16 * slots)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buffer, offset=header_bytes)
+        if create:
+            self.sequences[:] = -1
+            self.head[0] = -1
+
+    def write(self, frame, timestamp):
+        """Écrit une image dans la case suivante (écrivain unique)"""
+        seq = int(self.head[0]) + 1
+        slot = seq % self.slots
+        self.sequences[slot] = -1
+        self.frames[slot] = frame
+        self.timestamps[slot] = timestamp
+        self.sequences[slot] = seq
+        self.head[0] = seq
+        return seq
+
+    def read(self, seq):
+        """Retourne (timestamp, vue sur l'image) de l'image `seq`, ou (None, None) si réécrite"""
+        slot = seq % self.slots
+        if seq < 0 or self.sequences[slot] != seq:
+            return None, None
+        return float(self.timestamps[slot]), self.frames[slot]
+
+    def valid(self, seq):
+        return seq >= 0 and self.sequences[seq % self.slots] == seq
+
+    def latest_seq(self):
+        return int(self.head[0])
+
+    def close(self, unlink=None):
+        """Libère l'anneau; le segment est supprimé par son créateur (ou si `unlink`)"""
+        # Les vues doivent disparaître avant de libérer le tampon
+        self.sequences = self.timestamps = self.head = self.frames = None
+        try:
+            if self.owner if unlink is None else unlink:
+                self.memory.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            self.memory.close()
+        except BufferError:
+            pass
+
+
+class RingFrame(np.ndarray):
+    """Vue sur une case d'un FrameRing, qui garde le numéro de l'image lue (voir RingCapture.valid)"""
+
+    seq = -1
+
+
+class RingCapture:
+    """Lecture d'un FrameRing avec l'interface de CaptureService (latest, next_frame, recent).
+
+    Remplace la capture locale dans les processus de reconnaissance et dans le
+    serveur: la caméra n'est ouverte que par le processus de capture.
+    """
+
+    def __init__(self, ring, stale_after=2.0, poll=0.002):
+        self.ring = ring
+        self.stale_after = stale_after
+        self.poll = poll
+        self.running = True
+
+    @property
+    def error(self):
+        seq = self.ring.latest_seq()
+        timestamp, _ = self.ring.read(seq)
+        if timestamp is None or time.time() - timestamp > self.stale_after:
+            return "Frame capture error"
+        return None
+
+    def start(self):
+        self.running = True
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def latest(self, timeout=1.0):
+        # Capture arrêtée ou bloquée: les images plus anciennes que stale_after sont ignorées
+        return self.next_frame(after=time.time() - self.stale_after, timeout=timeout)
+
+    def _read(self, seq):
+        timestamp, frame = self.ring.read(seq)
+        if timestamp is None:
+            return None, None
+        frame = frame.view(RingFrame)
+        frame.seq = seq
+        return timestamp, frame
+
+    def valid(self, frame):
+        """Vrai si l'image n'a pas été réécrite depuis sa lecture.
+
+        Les images sont des vues sans copie: le processus de capture peut réécrire
+        la case pendant l'analyse. À vérifier une fois l'image exploitée (détection,
+        recadrage); un résultat calculé sur une image réécrite doit être recommencé.
+        """
+        return self.ring.valid(getattr(frame, "seq", -1))
+
+    def next_frame(self, after=0, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while self.running:
+            timestamp, frame = self._read(self.ring.latest_seq())
+            if timestamp is not None and timestamp > after:
+                return timestamp, frame
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll)
+        return None, None
+
+    def recent(self, count=None):
+        head = self.ring.latest_seq()
+        count = min(count or self.ring.slots - 1, self.ring.slots - 1, head + 1)
+        oldest = time.time() - self.stale_after
+        frames = []
+        for seq in range(head - count + 1, head + 1):
+            timestamp, frame = self._read(seq)
+            if timestamp is not None and timestamp > oldest:
+                frames.append((timestamp, frame))
+        return frames
+
+
+def capture_process(camera, source, slots, ready, stop):
+    """Processus de capture: lit la caméra et écrit chaque image dans un FrameRing.
+
+    L'anneau est créé à la taille de la première image, puis annoncé au
+    serveur par `ready` (camera, nom, forme). Une image de taille différente
+    (changement de résolution) est redimensionnée.
+    """
+    import cv2
+
+    capture = CaptureService(source)
+    if not capture.start():
+        ready.put((camera, None, None))
+        return
+
+    ring = None
+    last_timestamp = 0
+    try:
+        while not stop.is_set():
+            timestamp, frame = capture.next_frame(after=last_timestamp, timeout=0.5)
+            if frame is None:
+                continue
+            last_timestamp = timestamp
+            if frame.ndim == 2:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            if ring is None:
+                ring = FrameRing(f"face-{os.getpid()}-{uuid.uuid4().hex[:6]}", frame.shape, slots, create=True)
+                ready.put((camera, ring.name, ring.shape))
+            elif frame.shape != ring.shape:
+                frame = cv2.resize(frame, (ring.shape[1], ring.shape[0]))
+            ring.write(frame, timestamp)
+    finally:
+        capture.stop()
+        if ring is not None:
+            ring.close()
+
+
+class InferencePool:
+    """Reconnaissance répartie sur plusieurs processus, images partagées sans copie.
+
+    Un processus de capture par caméra écrit dans un FrameRing; `processes`
+    processus de reconnaissance lisent ces anneaux. Une requête (identifiant,
+    caméra, mode) passe par une file; seul le résultat (un petit dictionnaire)
+    revient par la file de résultats. `worker(worker_id, rings, requests,
+    results, stop)` tourne dans chaque processus de reconnaissance.
+    """
+
+    def __init__(self, worker, cameras, processes=2, slots=16, start_timeout=10.0):
+        self.worker = worker
+        self.cameras = dict(cameras)
+        self.processes = processes
+        self.slots = slots
+        self.start_timeout = start_timeout
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.requests = self.context.Queue()
+        self.results = self.context.Queue()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.rings = {}
+        self.capture_processes = []
+        self.worker_processes = []
+        self.dispatcher = None
+
+    def start(self):
+        """Démarre les captures, attend leurs anneaux, puis les processus de reconnaissance.
+
+        Retourne {caméra: FrameRing} (caméras ouvertes seulement).
+        """
+        ready = self.context.Queue()
+        for camera, source in self.cameras.items():
+            process = self.context.Process(
+                target=capture_process, args=(camera, source, self.slots, ready, self.stop_event),
+                name=f"capture-{camera}", daemon=True)
+            process.start()
+            self.capture_processes.append(process)
+
+        deadline = time.monotonic() + self.start_timeout
+        waiting = set(self.cameras)
+        specs = {}
+        while waiting and time.monotonic() < deadline:
+            try:
+                camera, name, shape = ready.get(timeout=max(0.01, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            waiting.discard(camera)
+            if name is not None:
+                specs[camera] = (name, shape, self.slots)
+                self.rings[camera] = FrameRing(name, shape, self.slots)
+
+        for worker_id in range(self.processes):
+            process = self.context.Process(
+                target=self.worker,
+                args=(worker_id, specs, self.requests, self.results, self.stop_event),
+                name=f"inference-{worker_id}", daemon=True)
+            process.start()
+            self.worker_processes.append(process)
+
+        self.dispatcher = threading.Thread(target=self._dispatch, name="inference-results", daemon=True)
+        self.dispatcher.start()
+        return self.rings
+
+    def _dispatch(self):
+        while not self.stop_event.is_set():
+            try:
+                request_id, result = self.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self.lock:
+                waiter = self.pending.pop(request_id, None)
+            if waiter is not None:
+                waiter[1] = result
+                waiter[0].set()
+
+    def recognize(self, camera, multi=False, burst=False, timeout=10.0):
+        """Envoie une requête à un processus libre et attend son résultat"""
+        request_id = uuid.uuid4().hex
+        waiter = [threading.Event(), None]
+        with self.lock:
+            self.pending[request_id] = waiter
+        self.requests.put((request_id, camera, multi, burst))
+        if not waiter[0].wait(timeout):
+            with self.lock:
+                self.pending.pop(request_id, None)
+            raise TimeoutError("Aucun processus de reconnaissance n'a répondu")
+        return waiter[1]
+
+    def stats(self):
+        with self.lock:
+            pending = len(self.pending)
+        return {
+            "processes": sum(process.is_alive() for process in self.worker_processes),
+            "captures": sum(process.is_alive() for process in self.capture_processes),
+            "pending": pending
+        }
+
+    def stop(self):
+        """Arrête les processus et supprime les anneaux (même si une capture a été tuée)"""
+        self.stop_event.set()
+        for process in self.worker_processes + self.capture_processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=1.0)
+        for ring in self.rings.values():
+            ring.close(unlink=True)
+        self.rings = {}
+        self.worker_processes, self.capture_processes = [], []
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for waiter in pending.values():
+            waiter[1] = {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Server stopping"}
+            waiter[0].set()
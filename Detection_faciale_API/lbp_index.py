@@ -0,0 +1,364 @@
+import numpy as np
+import os
+import json
+
+
+# Format binaire: un dossier de tableaux .npy ouverts en memmap + un en-tête JSON
+MODEL_HEADER_FILE = "model.json"
+MODEL_VERSION = 1
+
+
+class LBPHIndex:
+    """Recognizer LBPH en NumPy avec une galerie contiguë et une recherche vectorisée.
+
+    Les histogrammes LBP sont calculés comme cv2.face.LBPHFaceRecognizer (mêmes
+    paramètres par défaut, même distance chi-carré CHISQR_ALT), mais toute la
+    galerie est stockée dans une seule matrice (N, grid_x*grid_y*2^neighbors):
+    une prédiction compare la requête à tous les échantillons en une opération,
+    et les distances restent comparables au seuil utilisé avec OpenCV.
+
+    Avec `top_k`, un prototype par personne (moyenne des racines d'histogrammes,
+    cellules regroupées par 2x2) sert de présélection par produit scalaire: seuls
+    les échantillons des k personnes les plus proches sont comparés exactement.
+
+    Expose les méthodes utilisées par FaceRecognitionSystem sur le recognizer
+    OpenCV (train, update, predict, getLabels, write, read) plus predict_batch.
+    Le modèle est enregistré en binaire (voir write) et se recharge sans analyse.
+    """
+
+    def __init__(self, radius=1, neighbors=8, grid_x=8, grid_y=8, top_k=None):
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.top_k = top_k
+        self.clear()
+
+    # ------------------------------------------------------------------ galerie
+
+    def clear(self):
+        self.histograms = np.empty((0, self.histogram_size), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self.row_sums = np.empty(0, dtype=np.float64)
+        self.count = 0
+        self.prototypes = None
+        self.prototype_labels = None
+        self.rows_by_prototype = None
+
+    @property
+    def histogram_size(self):
+        return self.grid_x * self.grid_y * (1 << self.neighbors)
+
+    def empty(self):
+        return self.count == 0
+
+    def getLabels(self):
+        return self.labels[:self.count].reshape(-1, 1)
+
+    def train(self, images, labels):
+        """Remplace la galerie par les échantillons donnés"""
+        self.clear()
+        self.update(images, labels)
+
+    def update(self, images, labels):
+        """Ajoute des échantillons à la galerie sans recalculer les existants"""
+        labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        histograms = self.compute_histograms(images)
+        if len(histograms) != len(labels):
+            raise ValueError("images and labels must have the same length")
+        self.add_histograms(histograms, labels)
+
+    def add_histograms(self, histograms, labels):
+        """Ajoute des histogrammes déjà calculés (croissance amortie de la matrice)"""
+        needed = self.count + len(histograms)
+        if needed > len(self.histograms):
+            capacity = max(needed, 2 * len(self.histograms), 64)
+            grown = np.empty((capacity, self.histogram_size), dtype=np.float32)
+            grown[:self.count] = self.histograms[:self.count]
+            grown_labels = np.empty(capacity, dtype=np.int32)
+            grown_labels[:self.count] = self.labels[:self.count]
+            grown_sums = np.empty(capacity, dtype=np.float64)
+            grown_sums[:self.count] = self.row_sums[:self.count]
+            self.histograms, self.labels, self.row_sums = grown, grown_labels, grown_sums
+
+        self.histograms[self.count:needed] = histograms
+        self.labels[self.count:needed] = labels
+        self.row_sums[self.count:needed] = np.asarray(histograms).sum(axis=1, dtype=np.float64)
+        self.count = needed
+        self.prototypes = None
+
+    def copy(self, spare=0):
+        """Copie indépendante de la galerie, avec `spare` lignes libres pour un update().
+
+        Un index en service n'est jamais modifié: on met à jour une copie, puis on
+        l'échange (les prédictions en cours continuent sur l'original).
+        """
+        index = LBPHIndex(self.radius, self.neighbors, self.grid_x, self.grid_y, top_k=self.top_k)
+        capacity = self.count + spare
+        index.histograms = np.empty((capacity, self.histogram_size), dtype=np.float32)
+        index.histograms[:self.count] = self.histograms[:self.count]
+        index.labels = np.empty(capacity, dtype=np.int32)
+        index.labels[:self.count] = self.labels[:self.count]
+        index.row_sums = np.empty(capacity, dtype=np.float64)
+        index.row_sums[:self.count] = self.row_sums[:self.count]
+        index.count = self.count
+        return index
+
+    @classmethod
+    def from_opencv(cls, recognizer, top_k=None):
+        """Reprend les histogrammes d'un cv2.face.LBPHFaceRecognizer déjà entraîné"""
+        index = cls(recognizer.getRadius(), recognizer.getNeighbors(),
+                    recognizer.getGridX(), recognizer.getGridY(), top_k=top_k)
+        histograms = recognizer.getHistograms()
+        if len(histograms):
+            index.add_histograms(np.vstack(histograms).astype(np.float32, copy=False),
+                                 np.asarray(recognizer.getLabels()).reshape(-1))
+        return index
+
+    def pooled(self, histograms):
+        """Racines des histogrammes, cellules regroupées par blocs de 2x2 (présélection)"""
+        patterns = 1 << self.neighbors
+        cells = np.sqrt(histograms).reshape(-1, self.grid_y, self.grid_x, patterns)
+        gy, gx = self.grid_y - self.grid_y % 2, self.grid_x - self.grid_x % 2
+        cells = cells[:, :gy, :gx]
+        pooled = cells.reshape(-1, gy // 2, 2, gx // 2, 2, patterns).sum(axis=(2, 4))
+        return pooled.reshape(len(cells), -1)
+
+    def build_prototypes(self):
+        """Un prototype normalisé par personne pour la présélection top-k"""
+        labels = self.labels[:self.count]
+        unique, inverse = np.unique(labels, return_inverse=True)
+        prototypes = None
+        for start in range(0, self.count, 4096):
+            block = self.pooled(self.histograms[start:min(start + 4096, self.count)])
+            if prototypes is None:
+                prototypes = np.zeros((len(unique), block.shape[1]), dtype=np.float32)
+            np.add.at(prototypes, inverse[start:start + 4096], block)
+        norms = np.linalg.norm(prototypes, axis=1, keepdims=True)
+        prototypes /= np.maximum(norms, 1e-12)
+        self.set_prototypes(prototypes, unique)
+
+    def set_prototypes(self, prototypes, prototype_labels):
+        # Lignes de la galerie regroupées par personne, pour la recherche exacte
+        inverse = np.searchsorted(prototype_labels, self.labels[:self.count])
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(prototype_labels) + 1))
+        self.rows_by_prototype = [order[bounds[i]:bounds[i + 1]] for i in range(len(prototype_labels))]
+        self.prototype_labels = prototype_labels
+        self.prototypes = prototypes
+
+    # ------------------------------------------------------------- histogrammes
+
+    def compute_histograms(self, images, chunk=64):
+        """Histogrammes LBP spatiaux d'un lot d'images (N, H, W) -> (N, D) float32.
+
+        Les images sont traitées par paquets de `chunk` pour borner la mémoire
+        intermédiaire (codes et index de cases), quelle que soit la taille du lot.
+        """
+        histograms = np.empty((len(images), self.histogram_size), dtype=np.float32)
+        for start in range(0, len(images), chunk):
+            block = images[start:start + chunk]
+            if not (isinstance(block, np.ndarray) and block.ndim == 3):
+                block = np.stack([np.asarray(img) for img in block])
+            histograms[start:start + len(block)] = self._histograms(block)
+        return histograms
+
+    def _histograms(self, batch):
+        codes = self.lbp(batch)
+        n, rows, cols = codes.shape
+        cell_h, cell_w = rows // self.grid_y, cols // self.grid_x
+        patterns = 1 << self.neighbors
+
+        # Index de cellule de chaque pixel (les bords hors grille sont ignorés, comme OpenCV)
+        codes = codes[:, :cell_h * self.grid_y, :cell_w * self.grid_x]
+        cell_rows = np.arange(cell_h * self.grid_y) // cell_h
+        cell_cols = np.arange(cell_w * self.grid_x) // cell_w
+        cells = (cell_rows[:, None] * self.grid_x + cell_cols[None, :]) * patterns
+
+        bins = codes.astype(np.intp) + cells[None, :, :]
+        bins += (np.arange(n) * self.histogram_size)[:, None, None]
+        counts = np.bincount(bins.ravel(), minlength=n * self.histogram_size)
+        histograms = counts.reshape(n, self.histogram_size).astype(np.float32)
+        histograms /= np.float32(cell_h * cell_w)
+        return histograms
+
+    def lbp(self, batch):
+        """Codes LBP étendus (circulaires, interpolation bilinéaire) d'un lot d'images"""
+        r = self.radius
+        n, rows, cols = batch.shape
+        pixels = batch.astype(np.float32)
+        center = pixels[:, r:rows - r, r:cols - r]
+        center_u8 = batch[:, r:rows - r, r:cols - r]
+        code_type = np.uint8 if self.neighbors <= 8 else np.int64
+        codes = np.zeros(center.shape, dtype=code_type)
+        eps = np.finfo(np.float32).eps
+
+        for k in range(self.neighbors):
+            x = np.float32(r * np.cos(2.0 * np.pi * k / self.neighbors))
+            y = np.float32(-r * np.sin(2.0 * np.pi * k / self.neighbors))
+            fx, fy = int(np.floor(x)), int(np.floor(y))
+            cx, cy = int(np.ceil(x)), int(np.ceil(y))
+            tx, ty = np.float32(x - fx), np.float32(y - fy)
+            w1 = np.float32((1 - tx) * (1 - ty))
+            w2 = np.float32(tx * (1 - ty))
+            w3 = np.float32((1 - tx) * ty)
+            w4 = np.float32(tx * ty)
+
+            if w1 == 1 and w2 + w3 + w4 < 1e-10 and batch.dtype == np.uint8:
+                # Voisin sur un axe: la valeur interpolée vaut exactement le pixel
+                neighbor = batch[:, r + fy:rows - r + fy, r + fx:cols - r + fx]
+                bit = neighbor >= center_u8
+            else:
+                def shifted(dy, dx):
+                    return pixels[:, r + dy:rows - r + dy, r + dx:cols - r + dx]
+
+                # Même ordre d'addition qu'OpenCV: le test d'égalité à epsilon y est sensible
+                t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+                bit = (t > center) | (np.abs(t - center) < eps)
+            codes |= bit.astype(code_type) << code_type(k)
+        return codes
+
+    # --------------------------------------------------------------- prédiction
+
+    def predict(self, image):
+        label, distance = self.predict_batch(np.asarray(image)[None])[0]
+        return label, distance
+
+    def predict_batch(self, images):
+        """Prédit un lot d'images: liste de (label, distance)"""
+        if self.count == 0:
+            return [(-1, float("inf"))] * len(images)
+        queries = self.compute_histograms(images)
+        return [self.search(query) for query in queries]
+
+    def search(self, query):
+        """Plus proche voisin d'un histogramme dans la galerie"""
+        rows = None
+        if self.top_k and self.top_k > 0:
+            if self.prototypes is None:
+                self.build_prototypes()
+            if self.top_k < len(self.prototype_labels):
+                scores = self.prototypes @ self.pooled(query[None])[0]
+                best = np.argpartition(-scores, self.top_k - 1)[:self.top_k]
+                rows = np.sort(np.concatenate([self.rows_by_prototype[i] for i in best]))
+
+        distances = self.distances(query, rows)
+        index = int(np.argmin(distances))
+        row = index if rows is None else rows[index]
+        return int(self.labels[row]), float(distances[index])
+
+    def distances(self, query, rows=None, chunk=128):
+        """Distances chi-carré CHISQR_ALT d'OpenCV, 2 * somme (a - q)² / (a + q), de la
+        requête aux lignes `rows` de la galerie (toutes par défaut).
+
+        Seules les cases non nulles de la requête sont lues: sur une case où la
+        requête q vaut 0 le terme vaut a; ailleurs
+        (a - q)² / (a + q) = a + q (q - 3a) / (a + q). La somme des a de chaque
+        ligne est précalculée, il reste donc un seul terme par case non nulle.
+        Les lignes sont traitées par paquets de `chunk` qui tiennent en cache.
+        """
+        nonzero = np.flatnonzero(query)
+        q = query[nonzero]
+        total = self.count if rows is None else len(rows)
+        result = np.empty(total, dtype=np.float64)
+
+        for start in range(0, total, chunk):
+            end = min(start + chunk, total)
+            if rows is None:
+                block = np.take(self.histograms[start:end], nonzero, axis=1)
+                sums = self.row_sums[start:end]
+            else:
+                block = np.take(self.histograms[rows[start:end]], nonzero, axis=1)
+                sums = self.row_sums[rows[start:end]]
+
+            terms = block * np.float32(-3)
+            terms += q
+            terms *= q
+            block += q
+            terms /= block
+            result[start:end] = 2.0 * (sums + terms.sum(axis=1))
+        return result
+
+    # ------------------------------------------------------------- persistance
+
+    def write(self, path):
+        """Enregistre le modèle dans le dossier `path`.
+
+        - histograms.npy: galerie float32 (N, D), rouverte en memmap au chargement
+        - labels.npy, row_sums.npy: label et somme de chaque ligne
+        - prototypes.npy, prototype_labels.npy: présélection top-k, si utilisée
+        - model.json: version, paramètres LBP et nombre d'échantillons
+
+        Chaque fichier est écrit à côté puis renommé, l'en-tête en dernier: un
+        processus qui a ouvert l'ancienne galerie en memmap continue de la lire.
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "histograms": self.histograms[:self.count],
+            "labels": self.labels[:self.count],
+            "row_sums": self.row_sums[:self.count]
+        }
+        if self.top_k and self.count:
+            if self.prototypes is None:
+                self.build_prototypes()
+            arrays["prototypes"] = self.prototypes
+            arrays["prototype_labels"] = self.prototype_labels
+
+        for name, array in arrays.items():
+            filename = os.path.join(path, name + ".npy")
+            with open(filename + ".tmp", 'wb') as f:
+                np.save(f, array)
+            os.replace(filename + ".tmp", filename)
+
+        header = {
+            "version": MODEL_VERSION,
+            "count": int(self.count),
+            "histogram_size": self.histogram_size,
+            "params": {"radius": self.radius, "neighbors": self.neighbors,
+                       "grid_x": self.grid_x, "grid_y": self.grid_y},
+            "prototypes": "prototypes" in arrays
+        }
+        filename = os.path.join(path, MODEL_HEADER_FILE)
+        with open(filename + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(header, f)
+        os.replace(filename + ".tmp", filename)
+
+    def read(self, path, mmap=True):
+        """Recharge un modèle écrit par write; la galerie n'est pas copiée en mémoire.
+
+        Tout est lu et vérifié avant de remplacer la galerie: un modèle illisible
+        ou incomplet lève une exception et laisse l'index inchangé.
+        """
+        with open(os.path.join(path, MODEL_HEADER_FILE), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get("version") != MODEL_VERSION:
+            raise ValueError(f"Version de modèle non supportée: {header.get('version')}")
+
+        params = header["params"]
+        histogram_size = params["grid_x"] * params["grid_y"] * (1 << params["neighbors"])
+
+        def load(name, mmap_mode=None):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+
+        count = header["count"]
+        histograms = load("histograms", 'r' if mmap else None)
+        if histograms.shape != (count, histogram_size):
+            raise ValueError(f"Galerie incohérente avec l'en-tête: {histograms.shape}")
+        labels = np.array(load("labels"), dtype=np.int32)
+        row_sums = np.array(load("row_sums"), dtype=np.float64)
+        if labels.shape != (count,) or row_sums.shape != (count,):
+            raise ValueError(f"Labels incohérents avec l'en-tête: {labels.shape}, {row_sums.shape}")
+        prototypes = None
+        if header.get("prototypes") and count:
+            prototypes = load("prototypes"), load("prototype_labels")
+
+        # Lecture seule: un update() ultérieur recopie la galerie dans un tableau agrandi
+        self.radius, self.neighbors = params["radius"], params["neighbors"]
+        self.grid_x, self.grid_y = params["grid_x"], params["grid_y"]
+        self.clear()
+        self.histograms = histograms
+        self.labels = labels
+        self.row_sums = row_sums
+        self.count = count
+        if prototypes is not None:
+            self.set_prototypes(*prototypes)
@@ -1,29 +1,173 @@
 import cv2
 import numpy as np
 import os
+import math
 from datetime import datetime
 import time
 import pickle
-from flask import Flask, request, jsonify
+import json
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import threading
+import queue
+import shutil
 import base64
+import hmac
+from functools import partial
+from contextlib import contextmanager
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from camera import CaptureService, parse_cameras
+from detection import (FaceTracker, crop_faces, detection_latency_report, create_detector,
+                       parse_detectors, compare_detectors)
+from dataset import (SampleCache, SampleWriter, load_training_data, scan_training_data, decode_sample,
+                     PackedDataset, export_packed, import_packed, FACE_SIZE, IMAGE_EXTENSIONS)
+from enrollment import discover_sources, extract_faces
+from dedupe import SampleSelector, dedupe_training_data
+from lbp_index import LBPHIndex
+from registry import UserRegistry
+from serving import SingleFlight, Overloaded, FrameResultCache, EventStream
+from training import TrainingJobs, JobRunning
+from inference import InferencePool, FrameRing, RingCapture
+from profiling import SamplingProfiler, SlowRequestTracer, ProfilerBusy, format_collapsed
+from metrics import (REGISTRY, CONTENT_TYPE, STAGE_SECONDS, REQUEST_SECONDS, RESULTS,
+                     MODEL_LOAD_SECONDS, TRAINING_SECONDS, result_outcome)
+
+# Source d'images: index de caméra, fichier vidéo ou dossier d'images
+CAMERA_SOURCE = os.environ.get("CAMERA_SOURCE", "0")
+
+# Plusieurs portes: CAMERAS="entree=0,garage=rtsp://..." (la première est la caméra par défaut)
+CAMERAS = parse_cameras(os.environ.get("CAMERAS"), CAMERA_SOURCE)
+
+# Âge maximal (s) de l'image reconnue: au-delà, la source est considérée perdue
+FRAME_MAX_AGE = float(os.environ.get("FRAME_MAX_AGE", "2.0"))
+
+# Collecte: distance LBPH minimale entre un nouvel échantillon et ceux déjà gardés
+# (les images quasi identiques grossissent la galerie sans améliorer la précision; 0 = tout garder)
+DEDUPE_DISTANCE = float(os.environ.get("DEDUPE_DISTANCE", "25"))
+
+# Détecteur de visages: "haar" (défaut), "haar-alt", "haar-alt2", "cascade:file=...",
+# "dnn:model=res10.caffemodel,config=deploy.prototxt" (voir detection.create_detector);
+# par caméra: DETECTORS="entree=haar;garage=dnn:model=..."
+DETECTOR = os.environ.get("DETECTOR", "haar")
+DETECTORS = parse_detectors(os.environ.get("DETECTORS"))
+
+# Échelle de l'image analysée par le détecteur (1.0 = pleine résolution)
+DETECTION_SCALE = float(os.environ.get("DETECTION_SCALE", "1.0"))
+
+# Reconnaissance de tous les visages de l'image: "any" ou "all" doivent être reconnus
+MULTI_FACE = os.environ.get("MULTI_FACE", "0") == "1"
+MULTI_FACE_POLICY = os.environ.get("MULTI_FACE_POLICY", "any")
+
+# Flux /events: un changement d'identité n'est publié qu'après EVENT_CONFIRM_FRAMES
+# images consécutives concordantes; nombre maximal de clients abonnés
+EVENT_CONFIRM_FRAMES = int(os.environ.get("EVENT_CONFIRM_FRAMES", "2"))
+EVENT_MAX_SUBSCRIBERS = int(os.environ.get("EVENT_MAX_SUBSCRIBERS", "8"))
+
+# Mode rafale: les BURST_FRAMES dernières images sont notées (netteté, taille du visage)
+# et les BURST_BEST meilleures votent, pondérées par leur confiance
+BURST_MODE = os.environ.get("BURST_MODE", "0") == "1"
+BURST_FRAMES = int(os.environ.get("BURST_FRAMES", "6"))
+BURST_BEST = int(os.environ.get("BURST_BEST", "3"))
+
+# Reconnaissance par lot: OpenCV libère le GIL pendant la détection et la prédiction
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 4))
+BATCH_MAX_IMAGES = 64
+
+# Réponse compacte de /recognize (?format=compact ou Accept: application/x-face-compact)
+COMPACT_MIMETYPE = "application/x-face-compact"
+
+# Recognizer: "numpy" (galerie vectorisée, lbp_index.py) ou "opencv" (cv2.face LBPH)
+RECOGNIZER_BACKEND = os.environ.get("RECOGNIZER_BACKEND", "numpy")
+# Backend numpy: nombre de personnes présélectionnées par prototype (0 = recherche exhaustive)
+RECOGNIZER_TOP_K = int(os.environ.get("RECOGNIZER_TOP_K", "5"))
+
+# Serveur: les /recognize simultanés partagent une capture (fenêtre en secondes);
+# au-delà de RECOGNIZE_MAX_PENDING requêtes en attente, réponse 503
+RECOGNIZE_WINDOW = float(os.environ.get("RECOGNIZE_WINDOW", "0.1"))
+RECOGNIZE_MAX_PENDING = int(os.environ.get("RECOGNIZE_MAX_PENDING", "32"))
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", "16"))
+
+# Reconnaissance dans INFERENCE_PROCESSES processus (0 = threads du serveur): chaque caméra
+# est lue par un processus de capture qui partage ses images en mémoire (FrameRing)
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", "0"))
+
+# Résultat réutilisé si la scène n'a pas changé: durée de vie (s, 0 = désactivé)
+# et écart moyen maximal entre empreintes 32x24 (niveaux de gris 0-255)
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "0.5"))
+RESULT_CACHE_THRESHOLD = float(os.environ.get("RESULT_CACHE_THRESHOLD", "4.0"))
+
+# Modèle OpenCV (YAML + pickle des noms), converti au format binaire au premier démarrage
+LEGACY_MODEL_FILE = "face_recognition_model.yml"
+LEGACY_NAMES_FILE = "face_names.pkl"
+
+# Cache des échantillons décodés (memmap), ouvert seulement pour entraîner, dédoublonner ou exporter
+SAMPLE_CACHE = "training_cache"
+
+# Registre des utilisateurs (SQLite): IDs, noms, nombre et taille des échantillons
+USERS_DB = os.environ.get("USERS_DB", "users.db")
+
+# Trace (étapes + piles) des requêtes plus lentes que SLOW_REQUEST_MS (0 = désactivé),
+# modifiable à chaud par POST /admin/traces; durée maximale d'un /admin/profile
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "500"))
+PROFILE_MAX_SECONDS = 60
+PROFILE_MAX_INTERVAL = 0.1
+# Jeton des routes /admin (en-tête X-Admin-Token ou ?token=); sans jeton, routes désactivées
+# (derrière ngrok, toutes les requêtes publiques arrivent de 127.0.0.1)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
 
 class FaceRecognitionSystem:
-    def __init__(self):
-        # Détecteur de visages Haar Cascade
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    def __init__(self, cameras=CAMERAS, detection_scale=DETECTION_SCALE,
+                 backend=RECOGNIZER_BACKEND, detector=DETECTOR, detectors=DETECTORS, users_db=None,
+                 load=True):
+        # Détecteur de visages par défaut, et détecteurs propres à certaines caméras
+        self.detector_spec = detector
+        self.detector = create_detector(detector)
+        self.detectors = {camera: create_detector(spec) for camera, spec in detectors.items()}
+        
+        # Détection sur une copie réduite; le visage est recadré en pleine résolution
+        self.detection_scale = detection_scale
         
         # Recognizer LBPH (Local Binary Patterns Histograms)
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
+        self.backend = backend
+        self.recognizer = self.create_recognizer()
+        self.saved_recognizer = None  # Recognizer identique au fichier du modèle (lu ou écrit)
+        # Le recognizer en service n'est jamais modifié: train, update et rechargement
+        # en construisent un nouveau, échangé sous ce verrou; les prédictions lisent
+        # la référence sous le verrou puis prédisent sans le tenir (en parallèle)
+        self.model_lock = threading.RLock()
+        # Une seule mise à jour incrémentale à la fois (copie, update, échange)
+        self.update_lock = threading.Lock()
+        # OpenCV (pas de copie rapide): double tampon (recognizer en service, copie
+        # identique au repos). La mise à jour est faite sur la copie, échangée, puis
+        # rejouée sur l'ancien dès qu'aucune prédiction ne l'utilise plus
+        self.spare_recognizer = (None, None)
+        self.model_readers = {}  # id(recognizer) -> utilisations en cours (using_model)
+        self.model_released = threading.Condition(self.model_lock)
         
         self.known_faces = []
+        self.pending_faces = []  # Échantillons pas encore intégrés au modèle
+        # Échantillons (horodatage, face_id, image) enrôlés pendant un entraînement en
+        # arrière-plan: réappliqués au modèle qu'il produit (voir install_model)
+        self.job_samples = None
         self.known_names = []
         self.face_id_to_name = {}
         self.is_trained = False
         
-        self.model_file = "face_recognition_model.yml"
-        self.names_file = "face_names.pkl"
+        self.model_file, self.names_file = self.model_paths()
+        
+        # Caméras par identifiant, chacune maintenue ouverte par son propre thread de capture
+        self.cameras = dict(cameras)
+        self.default_camera = next(iter(self.cameras))
+        self.captures = {}
+        self.capture_lock = threading.Lock()
+        
+        # Suivi du visage entre deux images de chaque caméra (recherche limitée à une ROI)
+        self.trackers = {camera: FaceTracker(partial(self.detect_faces, camera=camera))
+                         for camera in self.cameras}
+        
+        # Dernier résultat de chaque caméra, réutilisé tant que l'image ne change pas
+        self.result_cache = FrameResultCache(RESULT_CACHE_TTL, RESULT_CACHE_THRESHOLD)
         
         # État pour l'API
         self.last_recognition = {
@@ -33,65 +177,353 @@ class FaceRecognitionSystem:
             "timestamp": None
         }
         
+        # Registre des utilisateurs: IDs monotones, index des noms, compteurs d'échantillons
+        self.registry = UserRegistry(users_db or USERS_DB)
+        
         # Charger le modèle s'il existe
-        self.load_model()
+        if load:
+            self.load_model()
+        self.sync_registry()
+        
+    def model_paths(self, tag=None):
+        """Fichiers (modèle, noms) du backend; avec `tag`, une copie de travail à côté.
+        
+        Backend numpy: dossier binaire ouvert en memmap, noms dans names.json.
+        """
+        if self.backend == "numpy":
+            model_file = "face_recognition_model" + (f".{tag}" if tag else "")
+            return model_file, os.path.join(model_file, "names.json")
+        if tag:
+            return f"face_recognition_model.{tag}.yml", f"face_names.{tag}.pkl"
+        return LEGACY_MODEL_FILE, LEGACY_NAMES_FILE
+    
+    def create_recognizer(self):
+        """Nouveau recognizer vide pour le backend configuré"""
+        if self.backend == "numpy":
+            return LBPHIndex(top_k=RECOGNIZER_TOP_K or None)
+        if self.backend != "opencv":
+            raise ValueError(f"Backend de reconnaissance inconnu: {self.backend}")
+        return cv2.face.LBPHFaceRecognizer_create()
+    
+    @contextmanager
+    def using_model(self):
+        """Recognizer en service, protégé de la mise à jour du double tampon pendant son usage"""
+        with self.model_lock:
+            recognizer = self.recognizer
+            key = id(recognizer)
+            self.model_readers[key] = self.model_readers.get(key, 0) + 1
+        try:
+            yield recognizer
+        finally:
+            with self.model_lock:
+                self.model_readers[key] -= 1
+                if not self.model_readers[key]:
+                    del self.model_readers[key]
+                    self.model_released.notify_all()
+    
+    def copy_recognizer(self, spare=0):
+        """Copie indépendante du recognizer en service, modifiable sans gêner les prédictions.
         
+        Backend numpy: copie de la galerie (avec `spare` lignes libres). OpenCV
+        n'offre pas de copie: le modèle est relu depuis son fichier s'il est à jour,
+        sinon écrit puis relu à côté.
+        """
+        with self.model_lock:
+            recognizer = self.recognizer
+        if self.backend == "numpy":
+            return recognizer.copy(spare)
+        if recognizer is self.saved_recognizer and os.path.exists(self.model_file):
+            copy = self.create_recognizer()
+            copy.read(self.model_file)
+            return copy
+        model_file, _ = self.model_paths(f"copy-{os.getpid()}-{threading.get_ident()}")
+        try:
+            recognizer.write(model_file)
+            copy = self.create_recognizer()
+            copy.read(model_file)
+        finally:
+            if os.path.exists(model_file):
+                os.remove(model_file)
+        return copy
+    
+    def detect_faces(self, gray, min_size=None, max_size=None, scale=None, camera=None, detector=None):
+        """Détecte les visages dans une image en niveaux de gris.
+        
+        Le détecteur est `detector`, sinon celui configuré pour `camera`, sinon
+        celui par défaut. Avec une échelle < 1, il tourne sur une copie réduite de
+        l'image et les rectangles sont ramenés aux coordonnées de l'image d'origine.
+        """
+        detector = detector or self.detectors.get(camera, self.detector)
+        scale = self.detection_scale if scale is None else scale
+        min_size = (max(100, min_size[0]), max(100, min_size[1])) if min_size else (100, 100)
+        
+        if scale >= 1.0:
+            with STAGE_SECONDS.time("detect"):
+                return detector.detect(gray, min_size, max_size)
+        
+        with STAGE_SECONDS.time("downscale"):
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        with STAGE_SECONDS.time("detect"):
+            faces = detector.detect(
+                small,
+                (max(24, int(min_size[0] * scale)), max(24, int(min_size[1] * scale))),
+                (int(max_size[0] * scale), int(max_size[1] * scale)) if max_size else None
+            )
+        height, width = gray.shape[:2]
+        boxes = []
+        for (x, y, w, h) in faces:
+            x, y = int(x / scale), int(y / scale)
+            w, h = min(int(w / scale), width - x), min(int(h / scale), height - y)
+            boxes.append((x, y, w, h))
+        return boxes
+    
+    def start_capture(self, camera=None):
+        """Démarre le service de capture permanent d'une caméra (par défaut la première).
+        
+        Retourne le service de capture, ou None si la caméra ne peut pas être ouverte.
+        """
+        camera = self.default_camera if camera is None else camera
+        with self.capture_lock:
+            capture = self.captures.get(camera)
+            if capture is None:
+                capture = CaptureService(self.cameras[camera], buffer_size=max(8, BURST_FRAMES),
+                                         max_age=FRAME_MAX_AGE)
+                self.captures[camera] = capture
+            if capture.running:
+                return capture
+            with STAGE_SECONDS.time("camera_open"):
+                return capture if capture.start() else None
+    
+    def stop_capture(self, camera=None):
+        """Arrête le service de capture d'une caméra (toutes par défaut) et la libère"""
+        with self.capture_lock:
+            cameras = list(self.captures) if camera is None else [camera]
+            for camera in cameras:
+                capture = self.captures.pop(camera, None)
+                if capture is not None:
+                    capture.stop()
+    
+    def camera_status(self):
+        """État de chaque caméra (la source n'est pas exposée: elle peut contenir un mot de passe)"""
+        status = {}
+        for camera in self.cameras:
+            capture = self.captures.get(camera)
+            status[camera] = {
+                "running": bool(capture and capture.running),
+                "error": capture.error if capture else None
+            }
+        return status
+    
+    def model_stamp(self):
+        """Identifie la version des fichiers du modèle (le fichier des noms est écrit en dernier)"""
+        try:
+            stat = os.stat(self.names_file)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
     def load_model(self):
-        """Charge le modèle entraîné s'il existe"""
+        """Charge le modèle entraîné s'il existe; retourne True si un modèle a été chargé.
+        
+        Le modèle et les noms sont lus entièrement avant d'être mis en service: en
+        cas d'erreur (fichier incomplet ou corrompu), le modèle courant est conservé.
+        """
+        if (self.backend == "numpy" and not os.path.exists(self.model_file)
+                and os.path.exists(LEGACY_MODEL_FILE) and os.path.exists(LEGACY_NAMES_FILE)):
+            self.convert_legacy_model()
+        
         if os.path.exists(self.model_file) and os.path.exists(self.names_file):
             try:
-                self.recognizer.read(self.model_file)
-                with open(self.names_file, 'rb') as f:
-                    self.face_id_to_name = pickle.load(f)
-                self.is_trained = True
-                print(f"✓ Modèle chargé avec {len(self.face_id_to_name)} personne(s)")
-            except:
-                print("⚠️  Erreur lors du chargement du modèle")
+                start = time.time()
+                recognizer = self.create_recognizer()
+                recognizer.read(self.model_file)
+                names = self.read_names(self.names_file)
+                with self.model_lock:
+                    self.recognizer = self.saved_recognizer = recognizer
+                    self.spare_recognizer = (None, None)
+                    self.face_id_to_name = names
+                    self.is_trained = True
+                MODEL_LOAD_SECONDS.set(time.time() - start)
+                print(f"✓ Modèle chargé avec {len(self.face_id_to_name)} personne(s) "
+                      f"en {time.time() - start:.2f}s")
+                return True
+            except Exception as e:
+                print(f"⚠️  Erreur lors du chargement du modèle: {e}")
+        return False
     
     def save_model(self):
         """Sauvegarde le modèle entraîné"""
+        # Modèle ou noms modifiés: les résultats en cache ne sont plus valides
+        self.result_cache.clear()
         try:
-            self.recognizer.write(self.model_file)
-            with open(self.names_file, 'wb') as f:
-                pickle.dump(self.face_id_to_name, f)
+            with self.using_model() as recognizer:
+                recognizer.write(self.model_file)
+            self.saved_recognizer = recognizer
+            self.write_names(self.names_file, self.face_id_to_name)
             print("✓ Modèle sauvegardé")
         except Exception as e:
             print(f"✗ Erreur de sauvegarde: {e}")
     
+    @staticmethod
+    def read_names(filename):
+        if filename.endswith(".json"):
+            with open(filename, 'r', encoding='utf-8') as f:
+                return {int(face_id): name for face_id, name in json.load(f).items()}
+        with open(filename, 'rb') as f:
+            return pickle.load(f)
+    
+    @staticmethod
+    def write_names(filename, names):
+        tmp_file = filename + ".tmp"
+        if filename.endswith(".json"):
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({str(face_id): name for face_id, name in names.items()}, f, ensure_ascii=False)
+        else:
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(names, f)
+        os.replace(tmp_file, filename)
+    
+    def convert_legacy_model(self, model_file=LEGACY_MODEL_FILE, names_file=LEGACY_NAMES_FILE,
+                             output="face_recognition_model"):
+        """Convertit un modèle OpenCV (.yml + .pkl) vers le format binaire du backend numpy.
+        
+        Le fichier YAML n'est analysé qu'une fois; les fichiers d'origine sont conservés.
+        """
+        print(f"\n🔁 Conversion de {model_file} vers {output}/ ...")
+        start = time.time()
+        legacy = cv2.face.LBPHFaceRecognizer_create()
+        legacy.read(model_file)
+        index = LBPHIndex.from_opencv(legacy, top_k=RECOGNIZER_TOP_K or None)
+        index.write(output)
+        self.write_names(os.path.join(output, "names.json"), self.read_names(names_file))
+        print(f"✓ {index.count} histogrammes convertis en {time.time() - start:.2f}s")
+        return index.count
+    
+    def install_model(self, model_file, names_file, removed_ids=(), since=None):
+        """Met en service un modèle construit à côté (entraînement en arrière-plan).
+        
+        Le nouveau recognizer est chargé entièrement avant d'être échangé sous le
+        verrou: les prédictions en cours finissent sur l'ancien, les suivantes
+        utilisent le nouveau. Ses fichiers remplacent ensuite ceux du modèle en
+        service. Les identités supprimées pendant l'entraînement (`removed_ids`)
+        restent désactivées. Les échantillons enrôlés après la lecture de
+        training_data par l'entraînement (horodatage `since`) lui sont ajoutés
+        par update(), sans quoi ils disparaîtraient du modèle.
+        """
+        recognizer = self.create_recognizer()
+        recognizer.read(model_file)
+        names = self.read_names(names_file)
+        for face_id in removed_ids:
+            names.pop(face_id, None)
+        
+        # Le processus d'entraînement a pu enregistrer des utilisateurs
+        self.registry.reload()
+        
+        with self.update_lock:
+            job_samples, self.job_samples = self.job_samples or [], None
+            late = [(face_id, img) for enrolled, face_id, img in job_samples
+                    if since is not None and enrolled >= since and face_id in self.registry]
+            if late:
+                recognizer.update([img for _, img in late], np.array([face_id for face_id, _ in late]))
+                for face_id, _ in late:
+                    names.setdefault(face_id, self.registry.get(face_id)["name"])
+                print(f"  + {len(late)} échantillon(s) enrôlé(s) pendant l'entraînement")
+            
+            with self.model_lock:
+                self.recognizer = self.saved_recognizer = recognizer
+                self.spare_recognizer = (None, None)
+                self.face_id_to_name = names
+                self.is_trained = True
+                self.pending_faces = []
+                
+                # Un dossier memmap reste lisible après renommage ou suppression
+                if os.path.isdir(model_file):
+                    old = f"{self.model_file}.old-{os.getpid()}"
+                    if os.path.exists(self.model_file):
+                        os.replace(self.model_file, old)
+                    os.replace(model_file, self.model_file)
+                    shutil.rmtree(old, ignore_errors=True)
+                else:
+                    os.replace(model_file, self.model_file)
+                    os.replace(names_file, self.names_file)
+        
+        self.result_cache.clear()
+        if late:
+            # Le fichier installé ne contient pas les échantillons réappliqués
+            self.save_model()
+        elif removed_ids:
+            self.write_names(self.names_file, self.face_id_to_name)
+    
+    def sync_registry(self):
+        """Complète le registre avec les noms du modèle chargé (migration d'un modèle existant).
+        
+        Les labels du modèle sont réservés: un nouvel utilisateur ne reçoit jamais
+        l'ID d'un ancien dont les échantillons sont encore dans le modèle.
+        """
+        missing = {face_id: name for face_id, name in self.face_id_to_name.items()
+                   if face_id not in self.registry}
+        if missing:
+            self.registry.import_users(missing)
+            self.registry.sync_samples(scan_training_data("training_data"))
+            print(f"✓ {len(missing)} utilisateur(s) ajouté(s) au registre {self.registry.path}")
+        labels = self.model_labels() | set(self.face_id_to_name)
+        if labels:
+            self.registry.reserve(max(labels))
+    
+    def find_user_id(self, name):
+        """Retourne l'ID d'un utilisateur (insensible à la casse) ou None"""
+        return self.registry.by_name(name)
+    
+    def register_user(self, name):
+        """Retourne l'ID d'un utilisateur, en l'enregistrant s'il est nouveau"""
+        face_id = self.registry.add(name)
+        self.face_id_to_name.setdefault(face_id, self.registry.get(face_id)["name"])
+        return face_id
+    
+    def model_labels(self):
+        """Retourne l'ensemble des labels présents dans le modèle entraîné"""
+        if not self.is_trained:
+            return set()
+        labels = self.recognizer.getLabels()
+        if labels is None or len(labels) == 0:
+            return set()
+        return set(np.unique(labels).tolist())
+    
     def delete_user(self, name):
         """Supprime un utilisateur et ses données"""
-        import shutil
-        
         # Trouver l'ID de l'utilisateur
-        user_id = None
-        for face_id, face_name in self.face_id_to_name.items():
-            if face_name.lower() == name.lower():
-                user_id = face_id
-                break
+        user_id = self.find_user_id(name)
         
         if user_id is None:
             print(f"❌ Utilisateur '{name}' non trouvé!")
             return False
         
+        # Le nom enregistré, pas celui saisi: la recherche est insensible à la casse
+        name = self.registry.get(user_id)["name"]
         print(f"\n🗑️  Suppression de '{name}'...")
         
-        # Supprimer du dictionnaire
-        del self.face_id_to_name[user_id]
-        
-        # Supprimer les données d'entraînement du dossier
+        # Supprimer d'abord les données d'entraînement du dossier: un dossier resté
+        # sans utilisateur serait réenregistré par le prochain entraînement complet
         person_folder = os.path.join("training_data", name)
         if os.path.exists(person_folder):
             try:
                 shutil.rmtree(person_folder)
                 print(f"  ✓ Dossier supprimé: {person_folder}")
-            except Exception as e:
-                print(f"  ⚠️  Erreur lors de la suppression du dossier: {e}")
+            except OSError as e:
+                print(f"  ❌ Erreur lors de la suppression du dossier: {e}")
+                return False
+        
+        # Supprimer du dictionnaire: le label reste dans le modèle mais n'est plus reconnu
+        self.face_id_to_name.pop(user_id, None)
+        self.registry.remove(user_id)
         
-        # Supprimer de la liste known_faces
+        # Supprimer des listes d'échantillons
         self.known_faces = [(fid, img) for fid, img in self.known_faces if fid != user_id]
+        self.pending_faces = [(fid, img) for fid, img in self.pending_faces if fid != user_id]
         
         print(f"✓ Utilisateur '{name}' supprimé!")
-        print("⚠️  Pensez à réentraîner le modèle (option [2]) pour appliquer les changements")
+        print("  Son label est désactivé immédiatement, sans réentraînement")
+        print("  Le prochain entraînement reconstruira le modèle pour purger ses échantillons")
         
         # Sauvegarder les changements
         self.save_model()
@@ -100,34 +532,28 @@ class FaceRecognitionSystem:
     
     def list_users(self):
         """Affiche la liste des utilisateurs enregistrés"""
-        if not self.face_id_to_name:
+        users = self.registry.users()
+        if not users:
             print("\n⚠️  Aucune personne enregistrée")
             return []
         
         print("\n📋 Personnes enregistrées:")
-        for face_id, name in self.face_id_to_name.items():
-            # Compter les échantillons
-            person_folder = os.path.join("training_data", name)
-            sample_count = 0
-            if os.path.exists(person_folder):
-                sample_count = len([f for f in os.listdir(person_folder) if f.endswith('.jpg')])
-            print(f"  • {name} (ID: {face_id}, Échantillons: {sample_count})")
+        for user in users:
+            print(f"  • {user['name']} (ID: {user['id']}, Échantillons: {user['samples']}, "
+                  f"{user['bytes'] / 1024:.0f} Ko)")
         
-        return list(self.face_id_to_name.values())
+        return [user["name"] for user in users]
     
-    def collect_training_data(self, name, num_samples=30):
+    def collect_training_data(self, name, num_samples=30, camera=None):
         """Collecte des échantillons de visage pour l'entraînement"""
         print(f"\n📸 Collecte de {num_samples} échantillons pour: {name}")
         print("➤ Bougez légèrement la tête dans différentes directions")
         
-        cap = cv2.VideoCapture(0)
-        
-        if not cap.isOpened():
+        capture = self.start_capture(camera)
+        if capture is None:
             print("❌ Impossible d'ouvrir la caméra!")
             return None
         
-        time.sleep(0.5)
-        
         cv2.namedWindow('Collecte echantillons', cv2.WINDOW_NORMAL)
         
         folder = "training_data"
@@ -138,29 +564,39 @@ class FaceRecognitionSystem:
         if not os.path.exists(person_folder):
             os.makedirs(person_folder)
         
-        face_id = len(self.face_id_to_name)
-        self.face_id_to_name[face_id] = name
+        # Réutiliser l'ID d'une personne déjà enregistrée (nouveaux échantillons)
+        face_id = self.register_user(name)
+        
+        # Ne pas écraser les échantillons existants
+        file_index = len(os.listdir(person_folder))
+        
+        # Les échantillons existants servent de référence: seuls les nouveaux points de vue sont gardés
+        selector = SampleSelector(DEDUPE_DISTANCE)
+        existing = [decode_sample(os.path.join(person_folder, f)) for f in sorted(os.listdir(person_folder))
+                    if f.lower().endswith(IMAGE_EXTENSIONS)]
+        selector.seed([img for img in existing if img is not None and img.shape == (FACE_SIZE, FACE_SIZE)])
         
         samples_collected = 0
+        samples_skipped = 0
         frame_count = 0
+        last_timestamp = 0
+        
+        tracker = FaceTracker(partial(self.detect_faces, camera=camera or self.default_camera))
         
         print(f"✓ Caméra ouverte! Collecte en cours...")
         
         while samples_collected < num_samples:
-            ret, frame = cap.read()
-            if not ret:
+            timestamp, frame = capture.next_frame(after=last_timestamp, timeout=2.0)
+            if frame is None:
                 break
             
+            last_timestamp = timestamp
+            frame = frame.copy()
             frame_count += 1
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             
-            # Détecter les visages
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.3,
-                minNeighbors=5,
-                minSize=(100, 100)
-            )
+            # Détecter les visages (autour du visage précédent si possible)
+            faces = tracker.detect(gray)
             
             for (x, y, w, h) in faces:
                 # Dessiner le rectangle
@@ -172,11 +608,21 @@ class FaceRecognitionSystem:
                     face_roi = gray[y:y+h, x:x+w]
                     face_resized = cv2.resize(face_roi, (200, 200))
                     
+                    # Ignorer un quasi-doublon d'un échantillon déjà gardé
+                    if not selector.accept(face_resized)[0]:
+                        samples_skipped += 1
+                        continue
+                    
                     # Sauvegarder
-                    filename = os.path.join(person_folder, f"{name}_{samples_collected}.jpg")
+                    filename = os.path.join(person_folder, f"{name}_{file_index}.jpg")
+                    while os.path.exists(filename):
+                        file_index += 1
+                        filename = os.path.join(person_folder, f"{name}_{file_index}.jpg")
                     cv2.imwrite(filename, face_resized)
+                    file_index += 1
+                    self.registry.add_samples(face_id, 1, os.path.getsize(filename))
                     
-                    self.known_faces.append((face_id, face_resized))
+                    self.add_sample(face_id, face_resized)
                     samples_collected += 1
                     
                     print(f"✓ Échantillon {samples_collected}/{num_samples} collecté", end='\r')
@@ -196,135 +642,792 @@ class FaceRecognitionSystem:
             
             if cv2.waitKey(1) & 0xFF == 27:  # ESC
                 print("\n❌ Collecte annulée")
-                cap.release()
                 cv2.destroyAllWindows()
                 return None
         
-        cap.release()
         cv2.destroyAllWindows()
         time.sleep(0.3)
         
-        print(f"\n✓ Collecte terminée: {samples_collected} échantillons")
+        print(f"\n✓ Collecte terminée: {samples_collected} échantillons "
+              f"({samples_skipped} quasi-doublon(s) ignoré(s))")
         return face_id
     
-    def train_recognizer(self):
-        """Entraîne le recognizer avec toutes les données collectées"""
-        if not self.known_faces:
-            # Charger depuis le dossier training_data
-            folder = "training_data"
-            if not os.path.exists(folder):
-                print("❌ Aucune donnée d'entraînement trouvée!")
+    def add_sample(self, face_id, img):
+        """Nouvel échantillon enrôlé, à intégrer au modèle au prochain entraînement"""
+        self.known_faces.append((face_id, img))
+        self.pending_faces.append((face_id, img))
+        job_samples = self.job_samples
+        if job_samples is not None:
+            job_samples.append((time.time(), face_id, img))
+    
+    def enroll_bulk(self, paths, num_samples=30, every=3, processes=None):
+        """Enrôlement sans caméra ni fenêtre depuis des vidéos et des dossiers de photos.
+        
+        Les visages sont détectés et recadrés en parallèle dans des processus (une
+        source par tâche), écrits dans training_data par un thread d'écriture, puis
+        le modèle est entraîné une seule fois avec tous les nouveaux échantillons.
+        """
+        sources = discover_sources(paths)
+        if not sources:
+            print("❌ Aucune vidéo ni dossier de photos trouvé!")
+            return None
+        
+        processes = processes or os.cpu_count() or 4
+        print(f"\n📼 Enrôlement de {len(sources)} source(s) avec {processes} processus...")
+        start = time.time()
+        writer = SampleWriter()
+        frames = 0
+        people = {}
+        file_indexes = {}
+        
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(extract_faces, name, path, self.detector_spec, num_samples, every,
+                                   DEDUPE_DISTANCE) for name, path in sources]
+            for future in as_completed(futures):
+                result = future.result()
+                name, faces = result["name"], result["faces"]
+                frames += result["frames"]
+                if result["error"] or not len(faces):
+                    print(f"  ⚠️  {name} ({os.path.basename(result['path'])}): "
+                          f"{result['error'] or 'aucun visage'}")
+                    continue
+                
+                face_id = self.register_user(name)
+                name = self.face_id_to_name[face_id]
+                person_folder = os.path.join("training_data", name)
+                os.makedirs(person_folder, exist_ok=True)
+                file_index = file_indexes.get(face_id, len(os.listdir(person_folder)))
+                for face in faces:
+                    filename = os.path.join(person_folder, f"{name}_{file_index}.jpg")
+                    while os.path.exists(filename):
+                        file_index += 1
+                        filename = os.path.join(person_folder, f"{name}_{file_index}.jpg")
+                    writer.put(filename, face, face_id)
+                    file_index += 1
+                    self.add_sample(face_id, face)
+                file_indexes[face_id] = file_index
+                people[name] = people.get(name, 0) + len(faces)
+                print(f"  ✓ {name}: {len(faces)} échantillon(s) en {result['seconds']:.1f}s "
+                      f"({result['frames']} images)")
+        
+        crop_seconds = time.time() - start
+        for face_id, (count, size) in writer.close().items():
+            self.registry.add_samples(face_id, count, size)
+        write_seconds = time.time() - start - crop_seconds
+        samples = sum(people.values())
+        
+        train_start = time.time()
+        if samples:
+            self.train_recognizer()
+        train_seconds = time.time() - train_start
+        total = time.time() - start
+        
+        report = {
+            "sources": len(sources),
+            "people": len(people),
+            "frames": frames,
+            "samples": samples,
+            "crop_seconds": crop_seconds,
+            "write_seconds": write_seconds,
+            "train_seconds": train_seconds,
+            "total_seconds": total
+        }
+        print(f"\n📊 Enrôlement: {len(people)} personne(s), {samples} échantillons, {frames} images lues")
+        print(f"  Détection + recadrage: {crop_seconds:.1f}s ({frames / max(crop_seconds, 1e-9):.0f} images/s)")
+        print(f"  Fin d'écriture: {write_seconds:.2f}s" + (f", {writer.errors} erreur(s)" if writer.errors else ""))
+        print(f"  Entraînement: {train_seconds:.1f}s")
+        print(f"  Total: {total:.1f}s ({samples / max(total, 1e-9):.1f} échantillons/s, "
+              f"{len(people) / max(total, 1e-9) * 60:.1f} personnes/min)")
+        return report
+    
+    def train_recognizer(self, full=False, packed=None, progress=None):
+        """Entraîne le recognizer.
+        
+        Par défaut, seuls les nouveaux échantillons (enrôlés, ou dossiers ajoutés à
+        training_data) sont ajoutés au modèle existant (LBPH update). Une
+        reconstruction complète depuis training_data (ou depuis un jeu empaqueté
+        `packed`) n'a lieu que sur demande, si le modèle n'existe pas encore, après
+        une suppression, ou si des photos ont été ajoutées ou retirées à la main dans
+        le dossier d'une personne déjà apprise. `progress(étape, **infos)` est appelé
+        au début de chaque étape de la reconstruction.
+        """
+        progress = progress or (lambda stage, **info: None)
+        removed = self.model_labels() - set(self.face_id_to_name)
+        
+        if self.is_trained and not full and not removed and packed is None:
+            changed = self.add_disk_samples()
+            if not changed:
+                self.update_recognizer()
                 return
-            
+            print(f"\n♻️  Reconstruction complète: dossier(s) modifié(s) depuis l'entraînement "
+                  f"({', '.join(changed)})")
+        
+        if removed:
+            print(f"\n♻️  Reconstruction complète: {len(removed)} identité(s) supprimée(s) à purger")
+        
+        progress("loading")
+        if packed is not None:
+            self.load_packed_samples(packed)
+        
+        # Charger depuis le dossier training_data
+        folder = "training_data"
+        if packed is None and os.path.exists(folder):
             print("\n🔄 Chargement des données d'entraînement...")
+            start = time.time()
+            samples, decoded = load_training_data(folder, cache=SampleCache(SAMPLE_CACHE))
+            self.known_faces = []
             
-            for person_name in os.listdir(folder):
-                person_path = os.path.join(folder, person_name)
-                if os.path.isdir(person_path):
-                    face_id = len(self.face_id_to_name)
-                    self.face_id_to_name[face_id] = person_name
-                    
-                    for img_name in os.listdir(person_path):
-                        img_path = os.path.join(person_path, img_name)
-                        img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-                        if img is not None:
-                            self.known_faces.append((face_id, img))
-                    
-                    print(f"  ✓ {person_name}: {len(os.listdir(person_path))} images")
+            for person_name, images in samples.items():
+                face_id = self.register_user(person_name)
+                self.known_faces.extend((face_id, img) for img in images)
+                print(f"  ✓ {person_name}: {len(images)} images")
+            
+            print(f"  {len(self.known_faces)} images chargées en {time.time() - start:.2f}s "
+                  f"({decoded} décodée(s), {len(self.known_faces) - decoded} depuis le cache)")
+            self.registry.sync_samples(scan_training_data(folder))
         
         if not self.known_faces:
-            print("❌ Aucun visage à entraîner!")
+            print("❌ Aucune donnée d'entraînement trouvée!")
             return
         
         print(f"\n🤖 Entraînement du modèle avec {len(self.known_faces)} échantillons...")
+        progress("training", samples=len(self.known_faces))
         
         # Préparer les données
+        start = time.time()
         face_ids = [face_id for face_id, _ in self.known_faces]
         face_images = [img for _, img in self.known_faces]
         
-        # Entraîner
-        self.recognizer.train(face_images, np.array(face_ids))
+        # Entraîner (un nouveau recognizer: train() ne repart pas de zéro sur un modèle lu),
+        # puis remplacer l'ancien: les prédictions en cours ne sont pas bloquées
+        recognizer = self.create_recognizer()
+        recognizer.train(face_images, np.array(face_ids))
+        with self.model_lock:
+            self.recognizer = recognizer
+            self.spare_recognizer = (None, None)
         self.is_trained = True
+        TRAINING_SECONDS.set(time.time() - start)
+        self.pending_faces = []
         
         # Sauvegarder
+        progress("saving")
         self.save_model()
         
         print(f"✓ Modèle entraîné avec succès!")
         print(f"  Personnes enregistrées: {', '.join(self.face_id_to_name.values())}")
     
-    def recognize_from_camera_single(self):
-        """Capture une seule image et reconnaît le visage (pour l'API)"""
+    def add_disk_samples(self, folder="training_data"):
+        """Ajoute aux échantillons en attente les dossiers de training_data absents du modèle.
+        
+        Le nombre de photos de chaque personne déjà apprise est comparé au registre:
+        retourne la liste des personnes dont le dossier ne correspond plus (photos
+        ajoutées ou retirées à la main), qui impose une reconstruction complète.
+        """
+        people = scan_training_data(folder)
+        labels = self.model_labels() | {face_id for face_id, _ in self.pending_faces}
+        changed, unseen = [], {}
+        for name, files in people.items():
+            face_id = self.registry.by_name(name)
+            if face_id is None or face_id not in labels:
+                if files:
+                    unseen[name] = files
+            elif len(files) != self.registry.get(face_id)["samples"]:
+                changed.append(name)
+        on_disk = {UserRegistry.key(name) for name in people}
+        changed += [user["name"] for user in self.registry.users()
+                    if user["id"] in labels and user["samples"]
+                    and UserRegistry.key(user["name"]) not in on_disk]
+        if changed or not unseen:
+            return changed
+        
+        for name, files in unseen.items():
+            face_id = self.register_user(name)
+            images = [img for img in map(decode_sample, (path for path, _, _ in files)) if img is not None]
+            for img in images:
+                self.add_sample(face_id, img)
+            print(f"  ✓ {name}: {len(images)} images (nouveau dossier)")
+        self.registry.sync_samples(people)
+        return changed
+    
+    def load_packed_samples(self, packed):
+        """Charge les échantillons d'un jeu empaqueté (memmap, sans décodage)"""
+        print(f"\n🔄 Chargement du jeu empaqueté {packed}...")
+        start = time.time()
+        dataset = PackedDataset(packed)
+        self.known_faces = []
+        
+        for person_name, faces in dataset.by_person().items():
+            face_id = self.register_user(person_name)
+            self.known_faces.extend((face_id, face) for face in faces)
+            print(f"  ✓ {person_name}: {len(faces)} images")
+        
+        print(f"  {len(self.known_faces)} images chargées en {time.time() - start:.2f}s")
+    
+    def evaluate(self, packed):
+        """Évalue le modèle sur un jeu empaqueté: précision et latence de prédiction"""
         if not self.is_trained:
-            return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Model not trained"}
+            print("❌ Le modèle n'est pas entraîné!")
+            return None
+        
+        dataset = PackedDataset(packed)
+        labels = np.asarray(dataset.labels)
+        correct = 0
+        latencies = []
+        
+        print(f"\n🧪 Évaluation sur {len(dataset)} échantillons...")
+        for index in range(len(dataset)):
+            start = time.perf_counter()
+            face_id, confidence = self.predict_faces(dataset.faces[index:index + 1])[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            
+            expected = dataset.names[labels[index]]
+            predicted = self.face_id_to_name.get(face_id) if confidence < 70 else None
+            if predicted is not None and predicted.lower() == expected.lower():
+                correct += 1
+        
+        if not latencies:
+            print("❌ Jeu empaqueté vide!")
+            return None
         
-        cap = cv2.VideoCapture(0)
+        report = {
+            "samples": len(dataset),
+            "accuracy": correct / len(dataset),
+            "predict_ms_mean": float(np.mean(latencies)),
+            "predict_ms_p95": float(np.percentile(latencies, 95))
+        }
+        print(f"  Précision: {report['accuracy'] * 100:.1f}%")
+        print(f"  Prédiction: {report['predict_ms_mean']:.2f} ms en moyenne, "
+              f"{report['predict_ms_p95']:.2f} ms au p95")
+        return report
+    
+    def update_recognizer(self):
+        """Ajoute au modèle existant les échantillons collectés depuis le dernier entraînement"""
+        if not self.pending_faces:
+            print("\n✓ Modèle déjà à jour, aucun nouvel échantillon")
+            return
+        
+        print(f"\n🤖 Mise à jour incrémentale avec {len(self.pending_faces)} nouvel(s) échantillon(s)...")
+        
+        face_ids = [face_id for face_id, _ in self.pending_faces]
+        face_images = [img for _, img in self.pending_faces]
+        
+        start = time.time()
+        with self.update_lock:
+            if self.backend == "numpy":
+                # Copie mise à jour puis échangée: les prédictions continuent sur l'ancien modèle
+                recognizer = self.copy_recognizer(spare=len(face_images))
+                recognizer.update(face_images, np.array(face_ids))
+                with self.model_lock:
+                    self.recognizer = recognizer
+            else:
+                self.update_double_buffered(face_images, np.array(face_ids))
+        TRAINING_SECONDS.set(time.time() - start)
+        self.pending_faces = []
+        
+        self.save_model()
+        
+        print(f"✓ Modèle mis à jour avec succès!")
+        print(f"  Personnes enregistrées: {', '.join(self.face_id_to_name.values())}")
+    
+    def update_double_buffered(self, face_images, face_ids):
+        """Mise à jour OpenCV (sous update_lock) sans relire ni réécrire tout le modèle.
+        
+        La copie au repos n'est construite (relecture du fichier) qu'à la première
+        mise à jour, ou après un entraînement ou un rechargement qui a remplacé le
+        recognizer en service.
+        """
+        mirrored, recognizer = self.spare_recognizer
+        if mirrored is not self.recognizer:
+            recognizer = self.copy_recognizer()
+        recognizer.update(face_images, face_ids)
+        with self.model_lock:
+            previous, self.recognizer = self.recognizer, recognizer
+            # Les prédictions commencées sur l'ancien recognizer doivent finir avant de le modifier
+            self.model_released.wait_for(lambda: id(previous) not in self.model_readers)
+        previous.update(face_images, face_ids)
+        if self.saved_recognizer is previous:
+            self.saved_recognizer = None
+        self.spare_recognizer = (recognizer, previous)
+    
+    def prepare_update(self):
+        """OpenCV: construit la copie au repos du double tampon avant la première mise à jour"""
+        if self.backend == "numpy" or not self.is_trained:
+            return
+        with self.update_lock:
+            live = self.recognizer
+            if self.spare_recognizer[0] is live:
+                return
+            spare = self.copy_recognizer()
+            if live is self.recognizer:
+                self.spare_recognizer = (live, spare)
+    
+    def recognize_from_camera_single(self, multi=False, burst=False, camera=None):
+        """Capture une seule image d'une caméra et reconnaît le visage (pour l'API).
+        
+        Avec `burst` (sans `multi`), les dernières images du tampon sont utilisées
+        au lieu de la seule plus récente (voir recognize_burst).
+        """
+        camera = self.default_camera if camera is None else camera
+        if camera not in self.cameras:
+            return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Unknown camera"}
         
-        if not cap.isOpened():
+        if not self.is_trained:
+            return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Model not trained"}
+        
+        capture = self.start_capture(camera)
+        if capture is None:
             return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Camera error"}
         
-        time.sleep(0.3)  # Laisser la caméra s'initialiser
+        # Une image lue en mémoire partagée (RingCapture) peut être réécrite pendant
+        # l'analyse: le résultat n'est gardé que si elle est restée intacte
+        burst = burst and not multi
+        tracker = self.trackers[camera]
+        for attempt in range(3):
+            # Lire directement l'image la plus récente du tampon
+            with STAGE_SECONDS.time("capture"):
+                _, frame = capture.latest()
+            
+            # Source perdue: ne jamais reconnaître une image d'avant la panne
+            if frame is None or capture.error:
+                return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Frame capture error"}
+            
+            # Scène inchangée depuis la dernière reconnaissance: réponse sans détection ni prédiction
+            with STAGE_SECONDS.time("cache"):
+                fingerprint = self.result_cache.fingerprint(frame)
+                cached = self.result_cache.get((camera, multi, burst), fingerprint)
+            if cached is not None and capture.valid(frame):
+                return dict(cached, cached=True)
+            
+            if burst:
+                frames = [f for _, f in capture.recent(BURST_FRAMES)]
+                result = self.recognize_burst(frames, tracker=tracker)
+            else:
+                frames = [frame]
+                result = self.recognize_frame(frame, tracker=tracker, multi=multi)
+            if all(capture.valid(f) for f in frames + [frame]):
+                break
+        else:
+            return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Frame overwritten"}
         
-        # Capturer plusieurs frames pour avoir une meilleure image
-        for _ in range(5):
-            ret, frame = cap.read()
+        result["camera"] = camera
+        self.result_cache.put((camera, multi, burst), fingerprint, result)
+        if "error" in result:
+            return result
         
-        ret, frame = cap.read()
-        cap.release()
+        self.last_recognition = result
+        return result
+    
+    def recognize_frame(self, frame, tracker=None, multi=False):
+        """Reconnaît le visage présent dans une image déjà capturée (BGR ou niveaux de gris).
         
-        if not ret:
-            return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Frame capture error"}
+        Un `tracker` limite la détection à la zone du visage trouvé dans l'image
+        précédente du même flux. Avec `multi`, tous les visages sont reconnus en un
+        seul lot et la réponse contient la liste des visages et une décision globale;
+        l'image est alors toujours analysée en entier pour trouver les nouveaux visages.
+        """
+        if not self.is_trained:
+            return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Model not trained"}
         
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with STAGE_SECONDS.time("convert"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
         
         # Détecter les visages
-        faces = self.face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.3,
-            minNeighbors=5,
-            minSize=(100, 100)
-        )
+        if tracker is not None:
+            faces = tracker.detect(gray, full=multi)
+        else:
+            faces = self.detect_faces(gray)
         
         if len(faces) == 0:
             return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "No face detected"}
         
-        # Prendre le premier visage détecté
-        (x, y, w, h) = faces[0]
-        face_roi = gray[y:y+h, x:x+w]
-        face_resized = cv2.resize(face_roi, (200, 200))
+        # Sans mode multi, prendre le premier visage détecté
+        boxes = [tuple(int(v) for v in box) for box in (faces if multi else faces[:1])]
         
-        # Prédire
-        face_id, confidence = self.recognizer.predict(face_resized)
+        # Recadrer tous les visages dans un seul lot, puis prédire le lot
+        with STAGE_SECONDS.time("crop"):
+            face_batch = crop_faces(gray, boxes)
+        predictions = self.predict_faces(face_batch)
         
-        # Plus la confiance est basse, meilleure est la correspondance
-        if confidence < 70:
-            name = self.face_id_to_name.get(face_id, "Unknown")
-            confidence_percent = int(100 - confidence)
+        timestamp = datetime.now().isoformat()
+        if not multi:
+            result = self.face_result(*predictions[0])
+            result["timestamp"] = timestamp
+            return result
+        
+        entries = []
+        for box, (face_id, confidence) in zip(boxes, predictions):
+            entry = self.face_result(face_id, confidence)
+            entry["box"] = list(box)
+            entries.append(entry)
+        
+        return self.aggregate_faces(entries, timestamp)
+    
+    def watch_identity(self, stream, keep_running, camera=None, confirm=EVENT_CONFIRM_FRAMES):
+        """Reconnaissance continue sur une caméra: publie sur `stream` à chaque changement.
+        
+        Chaque nouvelle image du tampon est reconnue dès que la précédente est
+        traitée. L'identité devant la porte (un nom, "Unknown" pour un visage
+        inconnu, None sans visage) n'est considérée comme changée qu'après
+        `confirm` images consécutives concordantes. Tourne tant que
+        keep_running() est vrai.
+        """
+        current = candidate = None
+        streak = 0
+        published = False
+        frame_time = 0
+        
+        camera = self.default_camera if camera is None else camera
+        while keep_running():
+            capture = self.start_capture(camera)
+            if capture is None:
+                time.sleep(1.0)
+                continue
+            
+            next_time, frame = capture.next_frame(after=frame_time, timeout=1.0)
+            if frame is None:
+                continue
+            frame_time = next_time
+            
+            try:
+                result = self.recognize_frame(frame, tracker=self.trackers[camera])
+                result["camera"] = camera
+            except Exception as e:
+                print(f"⚠️  Erreur de reconnaissance continue: {e}")
+                time.sleep(0.5)
+                continue
+            
+            if result["recognized"]:
+                identity = result["name"]
+            else:
+                identity = "Unknown" if "error" not in result else None
             
-            result = {
+            streak = streak + 1 if identity == candidate else 1
+            candidate = identity
+            if streak < confirm or (published and identity == current):
+                continue
+            
+            previous, current, published = current, identity, True
+            if "error" not in result:
+                self.last_recognition = result
+            stream.publish(dict(result, identity=identity, previous=previous))
+    
+    def recognize_burst(self, frames, best=BURST_BEST, tracker=None):
+        """Reconnaît le visage d'une rafale d'images par vote des meilleures.
+        
+        Le plus grand visage de chaque image est noté par la variance du Laplacien
+        du visage recadré (netteté), pondérée par sa taille (pleine note à partir de
+        200 px de large). Les `best` meilleurs sont prédits en un seul lot; chacun
+        vote pour son nom (ou Unknown) avec un poids de 100 - distance.
+        """
+        if not self.is_trained:
+            return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Model not trained"}
+        
+        candidates = []
+        for frame in frames:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            faces = tracker.detect(gray) if tracker is not None else self.detect_faces(gray)
+            if len(faces) == 0:
+                continue
+            box = tuple(int(v) for v in max(faces, key=lambda b: b[2] * b[3]))
+            with STAGE_SECONDS.time("crop"):
+                face = crop_faces(gray, [box])[0]
+            with STAGE_SECONDS.time("burst_score"):
+                sharpness = cv2.Laplacian(face, cv2.CV_64F).var()
+            candidates.append((sharpness * min(1.0, box[2] / FACE_SIZE), face))
+        
+        if not candidates:
+            return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "No face detected"}
+        
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        selected = candidates[:best]
+        predictions = self.predict_faces(np.stack([face for _, face in selected]))
+        
+        votes = {}
+        confidences = {}
+        for face_id, distance in predictions:
+            entry = self.face_result(face_id, distance)
+            votes[entry["name"]] = votes.get(entry["name"], 0.0) + max(0.0, 100.0 - distance)
+            confidences.setdefault(entry["name"], []).append(entry["confidence"])
+        
+        name = max(votes, key=votes.get)
+        recognized = name != "Unknown"
+        return {
+            "recognized": recognized,
+            "name": name,
+            "confidence": int(np.mean(confidences[name])) if recognized else 0,
+            "frames": len(frames),
+            "votes": {voter: round(weight, 1) for voter, weight in votes.items()},
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def predict_faces(self, face_batch):
+        """Prédit un lot de visages (N, 200, 200): liste de (face_id, distance)"""
+        with self.using_model() as recognizer, STAGE_SECONDS.time("predict"):
+            if hasattr(recognizer, "predict_batch"):
+                return recognizer.predict_batch(face_batch)
+            return [recognizer.predict(face) for face in face_batch]
+    
+    def face_result(self, face_id, confidence):
+        """Convertit une prédiction LBPH en résultat pour l'API"""
+        # Plus la confiance est basse, meilleure est la correspondance
+        # (un label supprimé n'est plus dans face_id_to_name et n'est donc jamais reconnu)
+        if confidence < 70 and face_id in self.face_id_to_name:
+            return {
                 "recognized": True,
-                "name": name,
-                "confidence": confidence_percent,
-                "timestamp": datetime.now().isoformat()
+                "name": self.face_id_to_name[face_id],
+                "confidence": int(100 - confidence)
             }
+        return {"recognized": False, "name": "Unknown", "confidence": 0}
+    
+    def aggregate_faces(self, entries, timestamp):
+        """Décision globale pour plusieurs visages.
+        
+        Politique "any": accès si au moins un visage est reconnu; "all": tous les
+        visages devant la porte doivent être reconnus. Les champs recognized, name
+        et confidence restent ceux lus par l'ESP32 (meilleur visage reconnu).
+        """
+        known = [entry for entry in entries if entry["recognized"]]
+        if MULTI_FACE_POLICY == "all":
+            granted = len(known) == len(entries)
         else:
-            result = {
-                "recognized": False,
-                "name": "Unknown",
-                "confidence": 0,
-                "timestamp": datetime.now().isoformat()
-            }
+            granted = len(known) > 0
         
-        self.last_recognition = result
-        return result
+        best = max(known, key=lambda entry: entry["confidence"]) if granted else None
+        return {
+            "recognized": granted,
+            "name": best["name"] if best else "Unknown",
+            "confidence": best["confidence"] if best else 0,
+            "decision": "granted" if granted else "denied",
+            "count": len(entries),
+            "faces": entries,
+            "timestamp": timestamp
+        }
+
+
+# Instance globale, construite par init_face_system (menu, commandes, serveur): les
+# processus lancés par spawn réimportent ce module sans lire le modèle ni ouvrir le registre
+face_system = None
 
 
-# Instance globale
-face_system = FaceRecognitionSystem()
+def init_face_system():
+    """Construit l'instance globale au premier appel et la retourne"""
+    global face_system
+    if face_system is None:
+        face_system = FaceRecognitionSystem()
+    return face_system
+
+
+# Pool de reconnaissance partagé par toutes les caméras et les requêtes par lot:
+# borne le travail concurrent au nombre de cœurs quel que soit le nombre de clients
+recognition_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="recognition")
+
+# Une seule capture + inférence pour les /recognize simultanés
+recognize_flight = SingleFlight(window=RECOGNIZE_WINDOW, max_pending=RECOGNIZE_MAX_PENDING)
+
+# Profilage à la demande (/admin/profile) et traces des requêtes lentes (/admin/traces):
+# chaque étape chronométrée par STAGE_SECONDS est ajoutée à la trace de la requête en cours
+profiler = SamplingProfiler()
+slow_tracer = SlowRequestTracer(SLOW_REQUEST_MS / 1000)
+STAGE_SECONDS.listener = slow_tracer.span
+
+def watch_model(system, stop, interval=1.0):
+    """Recharge le modèle dès que ses fichiers changent, jusqu'à `stop` (thread de fond).
+    
+    Le nouveau modèle est lu à côté puis échangé (load_model): les requêtes
+    continuent sur l'ancien pendant la lecture. Une version illisible n'est pas
+    retentée; l'ancien modèle reste en service jusqu'à la version suivante.
+    """
+    stamp, failed = system.model_stamp(), None
+    while not stop.wait(interval):
+        current = system.model_stamp()
+        if current in (stamp, failed):
+            continue
+        if system.load_model():
+            stamp, failed = current, None
+            system.result_cache.clear()
+        else:
+            failed = current
+
+
+def inference_worker(worker_id, rings, requests, results, stop):
+    """Processus de reconnaissance: les caméras sont lues dans les anneaux partagés.
+    
+    Le modèle est rechargé en arrière-plan dès que ses fichiers changent
+    (entraînement, mise à jour ou suppression faits par le serveur), sans
+    retarder les requêtes (voir watch_model).
+    """
+    system = FaceRecognitionSystem()
+    for camera, (name, shape, slots) in rings.items():
+        system.captures[camera] = RingCapture(FrameRing(name, shape, slots), stale_after=FRAME_MAX_AGE)
+    threading.Thread(target=watch_model, args=(system, stop), name="model-watch", daemon=True).start()
+    
+    # Étapes chronométrées pendant la requête, renvoyées avec le résultat: le
+    # serveur les ajoute à ses métriques (/metrics) et à la trace de la requête
+    stages = []
+    STAGE_SECONDS.listener = lambda stage, seconds: stages.append((stage, seconds))
+    
+    while not stop.is_set():
+        try:
+            request_id, camera, multi, burst = requests.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        
+        stages.clear()
+        if camera not in rings:
+            result = {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Camera error"}
+        else:
+            try:
+                result = system.recognize_from_camera_single(multi, burst, camera)
+            except Exception as e:
+                result = {"recognized": False, "name": "Unknown", "confidence": 0, "error": str(e)}
+        results.put((request_id, dict(result, stages=list(stages))))
+
+
+# Processus de reconnaissance (INFERENCE_PROCESSES > 0), démarrés avec le serveur
+inference_pool = None
+
+
+def start_inference_pool(processes=INFERENCE_PROCESSES):
+    """Démarre les processus de capture et de reconnaissance; le serveur lit aussi les anneaux"""
+    global inference_pool
+    inference_pool = InferencePool(inference_worker, face_system.cameras, processes,
+                                   slots=max(16, 2 * BURST_FRAMES))
+    face_system.stop_capture()
+    rings = inference_pool.start()
+    for camera, ring in rings.items():
+        face_system.captures[camera] = RingCapture(ring, stale_after=FRAME_MAX_AGE)
+    print(f"✓ {processes} processus de reconnaissance, {len(rings)}/{len(face_system.cameras)} "
+          f"caméra(s) en mémoire partagée")
+    return inference_pool
+
+
+def recognize_camera(camera, multi=False, burst=False):
+    """Reconnaissance sur une caméra: par les processus de reconnaissance s'ils sont démarrés,
+    sinon dans le pool de threads"""
+    if inference_pool is None:
+        return recognition_pool.submit(slow_tracer.bind(face_system.recognize_from_camera_single),
+                                       multi, burst, camera).result()
+    result = inference_pool.recognize(camera, multi, burst)
+    for stage, seconds in result.pop("stages", ()):
+        STAGE_SECONDS.record(seconds, stage)
+    if "error" not in result:
+        face_system.last_recognition = result
+    return result
+
+
+def training_worker(job_id, options, messages):
+    """Processus d'entraînement: reconstruit le modèle dans des fichiers de travail.
+    
+    Le processus serveur n'est jamais bloqué; il charge et met en service le
+    résultat à la fin (voir install_training_job).
+    """
+    # Reconstruction complète: le modèle en service n'est pas lu
+    system = FaceRecognitionSystem(load=False)
+    system.model_file, system.names_file = system.model_paths(f"job-{job_id}")
+    # Les échantillons enrôlés après cet instant ne sont peut-être pas lus: le serveur les réapplique
+    snapshot = time.time()
+    try:
+        system.train_recognizer(
+            full=True, packed=options.get("packed"),
+            progress=lambda stage, **info: messages.put(dict(stage=stage, **info))
+        )
+        if not os.path.exists(system.names_file):
+            raise RuntimeError("Aucune donnée d'entraînement")
+        messages.put({
+            "status": "trained",
+            "model_file": system.model_file,
+            "names_file": system.names_file,
+            "snapshot": snapshot,
+            "samples": len(system.known_faces),
+            "people": len(system.face_id_to_name)
+        })
+    except Exception as e:
+        for path in (system.model_file, system.names_file):
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        messages.put({"status": "failed", "error": str(e)})
+
+
+def install_training_job(job, message):
+    """Met en service le modèle d'un entraînement terminé"""
+    removed = set(job["options"].get("known_ids", [])) - set(face_system.face_id_to_name)
+    face_system.install_model(message["model_file"], message["names_file"], removed, message["snapshot"])
+    print(f"\n✓ Entraînement {job['id']}: nouveau modèle en service "
+          f"({message['samples']} échantillons, {message['people']} personne(s))")
+
+
+# Entraînements en arrière-plan (POST /train), un processus par entraînement
+training_jobs = TrainingJobs(training_worker, install_training_job)
+
+
+def start_training_job(packed=None):
+    """Lance une reconstruction complète en arrière-plan; lève JobRunning si une est en cours"""
+    # Garder les échantillons enrôlés pendant l'entraînement (voir install_model)
+    job_samples, face_system.job_samples = face_system.job_samples, []
+    try:
+        return training_jobs.start({"packed": packed, "known_ids": list(face_system.face_id_to_name)})
+    except JobRunning:
+        face_system.job_samples = job_samples
+        raise
+
+# Flux d'événements de reconnaissance (/events) par caméra, alimenté tant qu'un client est abonné
+recognition_events = {camera: EventStream(max_subscribers=EVENT_MAX_SUBSCRIBERS)
+                      for camera in CAMERAS}
+monitor_lock = threading.Lock()
+monitor_threads = {}
+
+
+def keep_monitoring(camera):
+    """Vrai tant que la caméra a un abonné; sinon son thread de surveillance se termine"""
+    with monitor_lock:
+        if recognition_events[camera].subscribers:
+            return True
+        monitor_threads.pop(camera, None)
+        return False
+
+
+def ensure_monitor(camera):
+    """Démarre la reconnaissance continue d'une caméra si elle ne tourne pas déjà"""
+    with monitor_lock:
+        if camera not in monitor_threads:
+            monitor_threads[camera] = threading.Thread(
+                target=face_system.watch_identity,
+                args=(recognition_events[camera], lambda: keep_monitoring(camera), camera),
+                name=f"monitor-{camera}", daemon=True
+            )
+            monitor_threads[camera].start()
+
+# Métriques lues à chaque export
+REGISTRY.gauge("face_gallery_samples", "Nombre d'échantillons dans le modèle",
+               lambda: len(face_system.recognizer.getLabels()) if face_system.is_trained else 0)
+REGISTRY.gauge("face_known_users", "Nombre d'utilisateurs enregistrés",
+               lambda: len(face_system.registry))
+REGISTRY.gauge("face_recognize_pending", "Requêtes /recognize en cours ou en attente",
+               lambda: recognize_flight.stats()["pending"])
+REGISTRY.gauge("face_event_subscribers", "Clients abonnés à /events",
+               lambda: sum(stream.subscribers for stream in recognition_events.values()))
+REGISTRY.gauge("face_result_cache_hit_ratio", "Part des /recognize servis par le cache",
+               lambda: face_system.result_cache.stats()["hit_ratio"])
 
 # Flask API
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+@app.before_request
+def start_trace():
+    """Suit la requête pour /admin/traces (sauf flux SSE et routes d'administration)"""
+    if request.path != '/events' and not request.path.startswith('/admin/'):
+        request.environ["face.trace"] = slow_tracer.start(f"{request.method} {request.path}")
+
+@app.teardown_request
+def finish_trace(error=None):
+    token = request.environ.pop("face.trace", None)
+    if token is not None:
+        slow_tracer.finish(token, path=request.full_path.rstrip('?'), method=request.method,
+                           error=repr(error) if error is not None else None)
+
 @app.after_request
 def after_request(response):
     """Ajoute les headers pour éviter les problèmes CORS et ngrok"""
@@ -339,7 +1442,7 @@ def home():
         "status": "online",
         "message": "Face Recognition API",
         "trained": face_system.is_trained,
-        "users": list(face_system.face_id_to_name.values())
+        "users": list(face_system.registry.names().values())
     })
 
 @app.route('/recognize', methods=['GET', 'OPTIONS'])
@@ -349,32 +1452,302 @@ def recognize():
         return '', 200
     
     print(f"\n🔔 Requête /recognize reçue de {request.remote_addr}")
-    result = face_system.recognize_from_camera_single()
+    start = time.perf_counter()
+    multi = multi_face_requested()
+    burst = burst_requested()
+    respond = compact_response if compact_requested() else json_response
+    camera = request.args.get("camera", face_system.default_camera)
+    if camera not in face_system.cameras:
+        return respond({"recognized": False, "name": "Unknown", "confidence": 0,
+                        "error": "Unknown camera"}, 404)
+    try:
+        # Une reconnaissance par caméra et par mode, exécutée dans le pool partagé
+        result = recognize_flight.call((camera, multi, burst), lambda: recognize_camera(camera, multi, burst))
+    except Overloaded:
+        RESULTS.inc("rejected")
+        print("⚠️  Serveur saturé, requête refusée")
+        return respond({"recognized": False, "name": "Unknown", "confidence": 0,
+                        "error": "Server busy"}, 503, {"Retry-After": "1"})
+    except TimeoutError:
+        RESULTS.inc("timeout")
+        return respond({"recognized": False, "name": "Unknown", "confidence": 0,
+                        "error": "Recognition timeout"}, 504)
+    RESULTS.inc(result_outcome(result))
+    REQUEST_SECONDS.observe(time.perf_counter() - start, "recognize")
     print(f"📤 Réponse envoyée: {result}")
-    return jsonify(result)
+    return respond(result)
+
+def compact_requested():
+    """Réponse compacte demandée par ?format=compact ou l'en-tête Accept"""
+    value = request.args.get("format")
+    if value is not None:
+        return value.lower() == "compact"
+    return COMPACT_MIMETYPE in request.headers.get("Accept", "")
+
+
+def compact_response(result, status=200, headers=None):
+    """Réponse "reconnu|nom|confiance" (ex. 1|Alice|87) pour les microcontrôleurs"""
+    name = str(result.get("name", "Unknown")).replace("|", "/").replace("\n", " ")
+    body = f"{1 if result.get('recognized') else 0}|{name}|{int(result.get('confidence', 0))}"
+    return body, status, dict(headers or {}, **{"Content-Type": "text/plain; charset=utf-8"})
+
+
+def json_response(result, status=200, headers=None):
+    return jsonify(result), status, headers or {}
+
+def decode_image(data):
+    """Décode une image encodée (octets bruts ou chaîne base64, éventuellement data URL)"""
+    if isinstance(data, str):
+        if data.startswith("data:") and "," in data:
+            data = data.split(",", 1)[1]
+        try:
+            data = base64.b64decode(data, validate=False)
+        except Exception:
+            return None
+    if not isinstance(data, (bytes, bytearray)):
+        return None
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def recognize_encoded(data, multi=False):
+    """Décode puis reconnaît une image envoyée au lot"""
+    frame = decode_image(data)
+    if frame is None:
+        return {"recognized": False, "name": "Unknown", "confidence": 0, "error": "Invalid image"}
+    return face_system.recognize_frame(frame, multi=multi)
+
+
+def multi_face_requested():
+    """Mode multi-visages demandé par ?multi=1 (défaut: variable MULTI_FACE)"""
+    value = request.args.get("multi")
+    if value is None:
+        return MULTI_FACE
+    return value.lower() in ("1", "true", "yes", "o")
+
+
+def burst_requested():
+    """Mode rafale demandé par ?burst=1 (défaut: variable BURST_MODE)"""
+    value = request.args.get("burst")
+    if value is None:
+        return BURST_MODE
+    return value.lower() in ("1", "true", "yes", "o")
+
+
+@app.route('/recognize/batch', methods=['POST', 'OPTIONS'])
+def recognize_batch():
+    """Endpoint pour reconnaître plusieurs images envoyées (base64 JSON ou multipart)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    if request.files:
+        images = [f.read() for f in request.files.getlist('images') or request.files.values()]
+    else:
+        payload = request.get_json(silent=True)
+        if payload is None:
+            payload = {}
+        if not isinstance(payload, dict):
+            return jsonify({"error": "JSON body must be an object"}), 400
+        images = payload.get("images", [])
+    
+    if not isinstance(images, list) or not images:
+        return jsonify({"error": "No images provided"}), 400
+    if len(images) > BATCH_MAX_IMAGES:
+        return jsonify({"error": f"Too many images (max {BATCH_MAX_IMAGES})"}), 413
+    
+    print(f"\n📦 Requête /recognize/batch reçue de {request.remote_addr}: {len(images)} image(s)")
+    start = time.perf_counter()
+    multi = multi_face_requested()
+    results = list(recognition_pool.map(slow_tracer.bind(lambda data: recognize_encoded(data, multi)), images))
+    for index, result in enumerate(results):
+        result["index"] = index
+        RESULTS.inc(result_outcome(result))
+    REQUEST_SECONDS.observe(time.perf_counter() - start, "batch")
+    
+    return jsonify({
+        "results": results,
+        "count": len(results),
+        "recognized": sum(1 for r in results if r.get("recognized"))
+    })
 
 @app.route('/status', methods=['GET'])
 def status():
     """Endpoint pour vérifier le statut du système"""
     return jsonify({
         "trained": face_system.is_trained,
-        "users": list(face_system.face_id_to_name.values()),
-        "last_recognition": face_system.last_recognition
+        "users": list(face_system.registry.names().values()),
+        "last_recognition": face_system.last_recognition,
+        "recognize_flight": recognize_flight.stats(),
+        "result_cache": face_system.result_cache.stats(),
+        "cameras": face_system.camera_status(),
+        "inference": inference_pool.stats() if inference_pool is not None else None
     })
 
+@app.route('/events', methods=['GET'])
+def events():
+    """Flux Server-Sent Events: un événement numéroté à chaque changement d'identité"""
+    camera = request.args.get("camera", face_system.default_camera)
+    if camera not in recognition_events:
+        return jsonify({"error": "Unknown camera"}), 404
+    try:
+        subscriber = recognition_events[camera].subscribe()
+    except Overloaded:
+        return jsonify({"error": "Too many subscribers"}), 503, {"Retry-After": "5"}
+    ensure_monitor(camera)
+    print(f"\n📡 Abonnement /events de {request.remote_addr}")
+    
+    def stream():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=15)
+                except queue.Empty:
+                    # Commentaire SSE: garde la connexion ouverte à travers les proxys
+                    yield ": keepalive\n\n"
+                    continue
+                yield EventStream.format(event)
+        finally:
+            recognition_events[camera].unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/train', methods=['GET', 'POST', 'OPTIONS'])
+def train():
+    """POST: lance une reconstruction du modèle en arrière-plan; GET: liste des entraînements"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    if request.method == 'GET':
+        return jsonify({"jobs": training_jobs.list()})
+    
+    try:
+        job = start_training_job()
+    except JobRunning as e:
+        return jsonify({"error": "Training already running", "job": e.job}), 409
+    print(f"\n🤖 Entraînement {job['id']} lancé en arrière-plan")
+    return jsonify(job), 202, {"Location": f"/train/{job['id']}"}
+
+@app.route('/train/<job_id>', methods=['GET'])
+def train_status(job_id):
+    """Progression d'un entraînement: stage, status (running, done, failed), durée"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métriques au format texte Prometheus (latences par étape, galerie, file d'attente)"""
+    return REGISTRY.render(), 200, {"Content-Type": CONTENT_TYPE}
+
 @app.route('/users', methods=['GET'])
 def get_users():
-    """Endpoint pour obtenir la liste des utilisateurs"""
+    """Endpoint pour obtenir la liste des utilisateurs (lue dans l'index du registre)"""
+    users = face_system.registry.users()
+    return jsonify({
+        "users": [user["name"] for user in users],
+        "count": len(users),
+        "details": users
+    })
+
+
+def admin_allowed():
+    """Routes /admin: jeton ADMIN_TOKEN obligatoire (l'adresse locale ne prouve rien derrière un tunnel)"""
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get("X-Admin-Token") or request.args.get("token") or ""
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/admin/profile', methods=['GET'])
+def admin_profile():
+    """Échantillonne les piles de tous les threads pendant ?seconds= secondes (1 par défaut).
+    
+    Retourne un fichier "collapsed" (une pile par ligne et son nombre
+    d'échantillons) pour flamegraph.pl, speedscope ou inferno. Sans profilage en
+    cours, rien n'est mesuré: activable en production sans redémarrage.
+    """
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        seconds = float(request.args.get("seconds", 1))
+        interval = float(request.args.get("interval", profiler.interval))
+    except ValueError:
+        return jsonify({"error": "Invalid seconds or interval"}), 400
+    if not (math.isfinite(seconds) and math.isfinite(interval)) or seconds <= 0 or interval <= 0:
+        return jsonify({"error": "Invalid seconds or interval"}), 400
+    if interval > min(seconds, PROFILE_MAX_INTERVAL):
+        return jsonify({"error": f"interval must not exceed seconds or {PROFILE_MAX_INTERVAL} s"}), 400
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    
+    print(f"\n🔬 Profilage de {seconds:g} s demandé par {request.remote_addr}")
+    try:
+        counts, samples = profiler.profile(seconds, interval)
+    except ProfilerBusy:
+        return jsonify({"error": "Profile already running"}), 409
+    filename = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+    return format_collapsed(counts), 200, {
+        "Content-Type": "text/plain; charset=utf-8",
+        "Content-Disposition": f"attachment; filename={filename}",
+        "X-Profile-Samples": str(samples)
+    }
+
+@app.route('/admin/traces', methods=['GET', 'POST'])
+def admin_traces():
+    """GET: dernières requêtes lentes (étapes et piles); POST {"threshold_ms": n}: change le seuil"""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            threshold_ms = float(data["threshold_ms"])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "threshold_ms required"}), 400
+        if not math.isfinite(threshold_ms):
+            return jsonify({"error": "threshold_ms must be finite"}), 400
+        slow_tracer.threshold = threshold_ms / 1000
+        print(f"\n🐢 Seuil des requêtes lentes: {slow_tracer.threshold * 1000:g} ms")
+    traces = slow_tracer.recent()
     return jsonify({
-        "users": list(face_system.face_id_to_name.values()),
-        "count": len(face_system.face_id_to_name)
+        "threshold_ms": slow_tracer.threshold * 1000,
+        "traces": traces,
+        "count": len(traces)
     })
 
 
-def run_flask():
-    """Lance le serveur Flask"""
-    print("\n🌐 Démarrage du serveur Flask...")
-    app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
+def stop_serving():
+    """Arrêt du serveur: caméras, processus de reconnaissance et de capture, mémoire partagée"""
+    global inference_pool
+    face_system.stop_capture()
+    if inference_pool is not None:
+        inference_pool.stop()
+        inference_pool = None
+
+
+def run_flask(host='0.0.0.0', port=5000, dev=False, processes=INFERENCE_PROCESSES):
+    """Lance le serveur: waitress multi-thread s'il est installé, sinon Flask en mode threaded"""
+    if processes > 0 and inference_pool is None:
+        start_inference_pool(processes)
+    # Premier enrôlement sans relecture du modèle (voir update_double_buffered)
+    threading.Thread(target=face_system.prepare_update, name="model-spare", daemon=True).start()
+    
+    try:
+        if not dev:
+            try:
+                from waitress import serve
+            except ImportError:
+                print("\n⚠️  waitress n'est pas installé (pip install waitress), serveur Flask multi-thread")
+            else:
+                print(f"\n🌐 Démarrage du serveur waitress ({SERVER_THREADS} threads)...")
+                serve(app, host=host, port=port, threads=SERVER_THREADS)
+                return
+        
+        print("\n🌐 Démarrage du serveur Flask...")
+        app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+    finally:
+        stop_serving()
 
 
 def start_ngrok():
@@ -399,6 +1772,7 @@ def start_ngrok():
         print(f"\n🔗 Endpoints disponibles:")
         print(f"   GET {public_url_str}/            - Test connexion")
         print(f"   GET {public_url_str}/recognize    - Reconnaître un visage")
+        print(f"   POST {public_url_str}/recognize/batch - Reconnaître plusieurs images")
         print(f"   GET {public_url_str}/status       - Statut du système")
         print(f"   GET {public_url_str}/users        - Liste des utilisateurs")
         print(f"\n🧪 Testez dans votre navigateur:")
@@ -455,7 +1829,17 @@ def main():
                 print("❌ Nom invalide!")
         
         elif choice == "2":
-            face_system.train_recognizer()
+            full = input("➤ Reconstruction complète du modèle? (o/n, défaut: n): ").strip().lower()
+            if full == 'o':
+                # La reconstruction tourne dans un processus séparé; le menu reste disponible
+                try:
+                    job = start_training_job()
+                    print(f"\n🤖 Entraînement {job['id']} lancé en arrière-plan")
+                    print("  Le modèle sera remplacé automatiquement à la fin")
+                except JobRunning as e:
+                    print(f"\n⚠️  Entraînement {e.job['id']} déjà en cours ({e.job['stage']})")
+            else:
+                face_system.train_recognizer()
         
         elif choice == "3":
             face_system.list_users()
@@ -468,7 +1852,7 @@ def main():
                     confirm = input(f"⚠️  Confirmer la suppression de '{name}' ? (o/n): ").strip().lower()
                     if confirm == 'o':
                         if face_system.delete_user(name):
-                            retrain = input("➤ Réentraîner le modèle maintenant? (o/n): ").strip().lower()
+                            retrain = input("➤ Reconstruire le modèle maintenant pour purger ses échantillons? (o/n): ").strip().lower()
                             if retrain == 'o':
                                 face_system.train_recognizer()
                     else:
@@ -530,5 +1914,109 @@ def main():
             print("\n❌ Choix invalide!")
 
 
+def run_cli(argv=None):
+    """Commandes non interactives; sans commande, le menu principal est lancé"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Système de reconnaissance faciale")
+    commands = parser.add_subparsers(dest="command")
+    
+    train_parser = commands.add_parser("train", help="Entraîner le modèle")
+    train_parser.add_argument("--full", action="store_true", help="Reconstruction complète")
+    train_parser.add_argument("--packed", help="Entraîner depuis un jeu empaqueté")
+    
+    serve_parser = commands.add_parser("serve", help="Démarrer le serveur API")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=5000)
+    serve_parser.add_argument("--dev", action="store_true", help="Serveur de développement Flask")
+    serve_parser.add_argument("--processes", type=int, default=INFERENCE_PROCESSES,
+                              help="Processus de reconnaissance (0 = threads du serveur)")
+    
+    export_parser = commands.add_parser("export-packed", help="training_data -> jeu empaqueté")
+    export_parser.add_argument("output", nargs="?", default="packed_data")
+    export_parser.add_argument("--folder", default="training_data")
+    
+    import_parser = commands.add_parser("import-packed", help="Jeu empaqueté -> training_data")
+    import_parser.add_argument("packed", nargs="?", default="packed_data")
+    import_parser.add_argument("--folder", default="training_data")
+    
+    evaluate_parser = commands.add_parser("evaluate", help="Évaluer le modèle sur un jeu empaqueté")
+    evaluate_parser.add_argument("packed", nargs="?", default="packed_data")
+    
+    report_parser = commands.add_parser("detect-report", help="Latence de détection par résolution")
+    report_parser.add_argument("--source", default=CAMERA_SOURCE, help="Caméra, vidéo ou dossier d'images")
+    report_parser.add_argument("--scales", default="1.0,0.75,0.5,0.33")
+    report_parser.add_argument("--frames", type=int, default=50)
+    
+    convert_parser = commands.add_parser("convert-model", help="Modèle .yml/.pkl -> format binaire")
+    convert_parser.add_argument("--model", default=LEGACY_MODEL_FILE)
+    convert_parser.add_argument("--names", default=LEGACY_NAMES_FILE)
+    convert_parser.add_argument("--output", default="face_recognition_model")
+    
+    enroll_parser = commands.add_parser("enroll", help="Enrôlement en masse depuis des vidéos ou photos")
+    enroll_parser.add_argument("sources", nargs="+",
+                               help="Dossiers (<nom>.mp4, <nom>/) ou nom=chemin")
+    enroll_parser.add_argument("--samples", type=int, default=30, help="Échantillons max. par source")
+    enroll_parser.add_argument("--every", type=int, default=3, help="Une image analysée sur N (vidéos)")
+    enroll_parser.add_argument("--processes", type=int, default=None)
+    
+    compare_parser = commands.add_parser("detect-compare",
+                                         help="Coût et rappel des détecteurs sur des images annotées")
+    compare_parser.add_argument("folder", help="Dossier d'images avec labels.json")
+    compare_parser.add_argument("--detectors", default="haar;haar-alt;haar-alt2",
+                                help="Descriptions séparées par ';' (voir DETECTOR)")
+    compare_parser.add_argument("--recall", type=float, default=0.9, help="Rappel visé")
+    compare_parser.add_argument("--iou", type=float, default=0.4)
+    
+    dedupe_parser = commands.add_parser("dedupe", help="Élaguer les quasi-doublons de training_data")
+    dedupe_parser.add_argument("--folder", default="training_data")
+    dedupe_parser.add_argument("--min-distance", type=float, default=DEDUPE_DISTANCE)
+    dedupe_parser.add_argument("--apply", action="store_true",
+                               help="Déplacer les doublons vers --pruned-folder (sinon simulation)")
+    dedupe_parser.add_argument("--pruned-folder", default="training_data_pruned")
+    
+    args = parser.parse_args(argv)
+    
+    # Les commandes sur les fichiers d'échantillons seuls ne lisent pas le modèle
+    if args.command not in ("export-packed", "import-packed"):
+        init_face_system()
+    
+    if args.command is None:
+        main()
+    elif args.command == "train":
+        face_system.train_recognizer(full=args.full, packed=args.packed)
+    elif args.command == "serve":
+        run_flask(args.host, args.port, dev=args.dev, processes=args.processes)
+    elif args.command == "export-packed":
+        start = time.time()
+        total, people = export_packed(args.folder, args.output, cache=SampleCache(SAMPLE_CACHE))
+        print(f"✓ {total} échantillons ({people} personne(s)) exportés vers {args.output} "
+              f"en {time.time() - start:.2f}s")
+    elif args.command == "import-packed":
+        total, people = import_packed(args.packed, args.folder)
+        print(f"✓ {total} échantillons ({people} personne(s)) importés dans {args.folder}")
+    elif args.command == "evaluate":
+        face_system.evaluate(args.packed)
+    elif args.command == "convert-model":
+        face_system.convert_legacy_model(args.model, args.names, args.output)
+    elif args.command == "detect-report":
+        scales = [float(scale) for scale in args.scales.split(",")]
+        detection_latency_report(face_system.detect_faces, args.source, scales, args.frames)
+    elif args.command == "enroll":
+        face_system.enroll_bulk(args.sources, args.samples, args.every, args.processes)
+    elif args.command == "detect-compare":
+        specs = [spec.strip() for spec in args.detectors.split(";") if spec.strip()]
+        detect_fns = {spec: partial(face_system.detect_faces, detector=create_detector(spec))
+                      for spec in specs}
+        compare_detectors(detect_fns, args.folder, args.recall, args.iou)
+    elif args.command == "dedupe":
+        print(f"\n🔍 Recherche des quasi-doublons (distance < {args.min_distance})...")
+        report = dedupe_training_data(args.folder, args.min_distance, args.apply,
+                                      args.pruned_folder, cache=SampleCache(SAMPLE_CACHE))
+        if report and args.apply:
+            face_system.registry.sync_samples(scan_training_data(args.folder))
+            print("  Reconstruire le modèle: python main.py train --full")
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_cli()
\ No newline at end of file
@@ -0,0 +1,173 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Bornes des histogrammes de latence (secondes)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(label, value, extra=""):
+    parts = []
+    if label is not None:
+        parts.append(f'{label}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Histogram:
+    """Histogramme cumulatif au format Prometheus, avec un label optionnel"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.series = {}  # valeur du label -> [compteurs par borne, somme, nombre]
+        self.lock = threading.Lock()
+        self.listener = None  # listener(label, durée) après chaque time(): traces des requêtes lentes
+
+    def observe(self, value, label_value=None):
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def record(self, elapsed, label_value=None):
+        """Observe une durée et la transmet au listener (durées mesurées ailleurs, ex. processus)"""
+        self.observe(elapsed, label_value)
+        if self.listener is not None:
+            self.listener(label_value, elapsed)
+
+    @contextmanager
+    def time(self, label_value=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - start, label_value)
+
+    def samples(self):
+        with self.lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self.series.items()}
+        for label_value, (counts, total, count) in sorted(series.items(), key=lambda item: str(item[0])):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.label, label_value, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label, label_value)} {total}"
+            yield f"{self.name}_count{_labels(self.label, label_value)} {count}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, label_value=None, amount=1):
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for label_value, value in sorted(values.items(), key=lambda item: str(item[0])):
+            yield f"{self.name}{_labels(self.label, label_value)} {value}"
+
+
+class Gauge:
+    """Valeur instantanée, fixée par set() ou lue à chaque export par `fn`"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return
+        yield f"{self.name} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, label, buckets))
+
+    def counter(self, name, help, label=None):
+        return self.register(Counter(name, help, label))
+
+    def gauge(self, name, help, fn=None):
+        return self.register(Gauge(name, help, fn))
+
+    def render(self):
+        """Exporte toutes les métriques au format texte Prometheus (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Étapes de la reconnaissance: camera_open, capture, cache, convert, detect, crop, predict, burst_score
+STAGE_SECONDS = REGISTRY.histogram(
+    "face_stage_seconds", "Durée de chaque étape de la reconnaissance", label="stage")
+REQUEST_SECONDS = REGISTRY.histogram(
+    "face_request_seconds", "Durée des requêtes HTTP de reconnaissance", label="endpoint")
+RESULTS = REGISTRY.counter(
+    "face_recognition_results_total", "Résultats de reconnaissance par issue", label="result")
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "face_model_load_seconds", "Durée du dernier chargement du modèle")
+TRAINING_SECONDS = REGISTRY.gauge(
+    "face_training_duration_seconds", "Durée du dernier entraînement ou mise à jour du modèle")
+
+
+def result_outcome(result):
+    """Issue d'un résultat pour le compteur RESULTS"""
+    if result.get("cached"):
+        return "cached"
+    if result.get("recognized"):
+        return "recognized"
+    error = result.get("error")
+    if error == "No face detected":
+        return "no_face"
+    return "error" if error else "unknown"
@@ -0,0 +1,217 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+
+class ProfilerBusy(Exception):
+    """Un profilage est déjà en cours"""
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame, prefix=None):
+    """Pile d'appels au format "collapsed" (de la racine à la fonction courante, séparée par ';')"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    if prefix:
+        names.append(prefix)
+    return ";".join(reversed(names))
+
+
+def format_collapsed(counts):
+    """Lignes "pile nombre", lisibles par flamegraph.pl, speedscope ou inferno"""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class SamplingProfiler:
+    """Profileur par échantillonnage de tous les threads du processus.
+
+    Un thread relève les piles de tous les autres (sys._current_frames) toutes
+    les `interval` secondes, pendant la durée demandée seulement: sans profilage
+    en cours, aucun coût. Un seul profilage à la fois.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.lock = threading.Lock()
+
+    def profile(self, seconds, interval=None):
+        """Échantillonne pendant `seconds` secondes; retourne (Counter des piles, nombre de relevés)"""
+        interval = interval or self.interval
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusy("Profilage déjà en cours")
+        try:
+            own = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            counts = Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    if ident not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    counts[collapse(frame, names.get(ident, str(ident)))] += 1
+                samples += 1
+                # Jamais au-delà de la durée demandée, même avec un long intervalle
+                time.sleep(max(0.0, min(interval, deadline - time.monotonic())))
+            return counts, samples
+        finally:
+            self.lock.release()
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.stacks = Counter()
+        self.threads = {threading.get_ident()}
+        self.lock = threading.Lock()
+
+    def span(self, stage, seconds):
+        end = time.perf_counter()
+        with self.lock:
+            self.spans.append((stage, end - seconds - self.start, seconds))
+
+
+class SlowRequestTracer:
+    """Traces des requêtes lentes: étapes chronométrées et piles échantillonnées.
+
+    Chaque requête suivie reçoit une trace (contextvar) qui enregistre la durée de
+    ses étapes (STAGE_SECONDS), y compris dans les threads du pool où elle est
+    poursuivie (voir bind). Dès qu'une requête dépasse `threshold` secondes, un
+    thread de surveillance échantillonne les piles de ses threads jusqu'à la fin.
+    Ce thread dort jusqu'à l'échéance de la plus ancienne requête en cours, et
+    sans limite s'il n'y en a aucune. Les `keep` dernières traces lentes sont
+    conservées. `threshold` <= 0 désactive.
+    """
+
+    def __init__(self, threshold=0.5, keep=50, interval=0.01):
+        self._threshold = threshold
+        self.interval = interval
+        self.current = contextvars.ContextVar("slow_trace", default=None)
+        self.active = set()
+        self.traces = deque(maxlen=keep)
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.watchdog = None
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    @threshold.setter
+    def threshold(self, value):
+        # Réveille la surveillance: l'échéance des requêtes en cours change
+        with self.condition:
+            self._threshold = value
+            self.condition.notify()
+
+    def start(self, name):
+        """Commence la trace d'une requête; retourne un jeton pour finish()"""
+        if self.threshold <= 0:
+            return None
+        trace = Trace(name)
+        with self.condition:
+            self.active.add(trace)
+            if self.watchdog is None:
+                self.watchdog = threading.Thread(target=self._watch, name="slow-trace", daemon=True)
+                self.watchdog.start()
+            elif len(self.active) == 1:
+                # Surveillance en attente sans échéance: la première requête en donne une
+                self.condition.notify()
+        return trace, self.current.set(trace)
+
+    def finish(self, token, **info):
+        """Termine la trace; la garde si la requête a dépassé le seuil"""
+        if token is None:
+            return
+        trace, context_token = token
+        try:
+            self.current.reset(context_token)
+        except ValueError:
+            self.current.set(None)
+        duration = time.perf_counter() - trace.start
+        with self.lock:
+            self.active.discard(trace)
+        if self.threshold <= 0 or duration < self.threshold:
+            return
+        with trace.lock:
+            record = dict(info, **{
+                "name": trace.name,
+                "started": trace.started,
+                "duration_ms": duration * 1000,
+                "spans": [{"stage": stage, "offset_ms": offset * 1000, "ms": seconds * 1000}
+                          for stage, offset, seconds in trace.spans],
+                "stacks": format_collapsed(trace.stacks)
+            })
+        with self.lock:
+            self.traces.append(record)
+
+    def span(self, stage, seconds):
+        """Enregistre une étape de la requête en cours (appelé par STAGE_SECONDS)"""
+        trace = self.current.get()
+        if trace is not None:
+            trace.span(stage, seconds)
+
+    def bind(self, fn):
+        """Poursuit la trace courante dans un autre thread (tâche soumise à un pool)"""
+        trace = self.current.get()
+        if trace is None:
+            return fn
+        context = contextvars.copy_context()
+
+        def run(*args, **kwargs):
+            ident = threading.get_ident()
+            with trace.lock:
+                trace.threads.add(ident)
+            try:
+                return context.run(fn, *args, **kwargs)
+            finally:
+                with trace.lock:
+                    trace.threads.discard(ident)
+        return run
+
+    def recent(self):
+        """Traces lentes, de la plus récente à la plus ancienne"""
+        with self.lock:
+            return list(reversed(self.traces))
+
+    def _slow(self):
+        """Attend qu'une requête en cours dépasse le seuil; retourne les requêtes lentes"""
+        with self.condition:
+            while True:
+                threshold = self._threshold
+                if threshold <= 0 or not self.active:
+                    self.condition.wait()
+                    continue
+                now = time.perf_counter()
+                deadline = min(trace.start for trace in self.active) + threshold
+                if deadline > now:
+                    self.condition.wait(deadline - now)
+                    continue
+                return [trace for trace in self.active if now - trace.start >= threshold]
+
+    def _watch(self):
+        while True:
+            slow = self._slow()
+            frames = sys._current_frames()
+            for trace in slow:
+                with trace.lock:
+                    for ident in trace.threads:
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            trace.stacks[collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
@@ -0,0 +1,158 @@
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL UNIQUE,
+    samples INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+"""
+
+
+class UserRegistry:
+    """Registre persistant des utilisateurs (SQLite), avec index en mémoire.
+
+    Les IDs sont monotones (AUTOINCREMENT): un ID supprimé n'est jamais réattribué,
+    même après redémarrage. Le nom est indexé sans casse (name_key unique). Le
+    nombre d'échantillons et leur taille sont tenus à jour à chaque écriture, si
+    bien que les lectures (by_name, users, names) ne touchent ni la base ni le
+    disque: elles lisent l'index reconstruit après chaque modification.
+    """
+
+    def __init__(self, path="users.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self.connection.row_factory = sqlite3.Row
+        # WAL: le processus d'entraînement peut écrire pendant que le serveur lit
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.reload()
+
+    @staticmethod
+    def key(name):
+        return name.strip().casefold()
+
+    def reload(self):
+        """Relit la base (modifications faites par un autre processus)"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, name, samples, bytes, created FROM users ORDER BY id").fetchall()
+            self._index([dict(row) for row in rows])
+
+    def _index(self, users):
+        self.by_id = {user["id"]: user for user in users}
+        self.by_key = {self.key(user["name"]): user["id"] for user in users}
+        self._users = users
+        self._names = {user["id"]: user["name"] for user in users}
+
+    def _commit(self):
+        self.connection.commit()
+        rows = self.connection.execute(
+            "SELECT id, name, samples, bytes, created FROM users ORDER BY id").fetchall()
+        self._index([dict(row) for row in rows])
+
+    # ----------------------------------------------------------------- lecture
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, face_id):
+        return face_id in self.by_id
+
+    def by_name(self, name):
+        """ID d'un utilisateur (insensible à la casse) ou None"""
+        return self.by_key.get(self.key(name))
+
+    def get(self, face_id):
+        return self.by_id.get(face_id)
+
+    def users(self):
+        """Liste des utilisateurs (id, name, samples, bytes, created), par ID"""
+        return self._users
+
+    def names(self):
+        """{id: nom}"""
+        return self._names
+
+    # --------------------------------------------------------------- écriture
+
+    def add(self, name, min_id=0):
+        """Enregistre un utilisateur et retourne son ID (l'existant si le nom est connu).
+
+        L'ID est supérieur à tous ceux déjà attribués, et au moins `min_id`
+        (labels encore présents dans un modèle entraîné). Un autre processus
+        (entraînement en arrière-plan) a pu enregistrer le même nom ou prendre
+        l'ID entre-temps: la base fait foi, pas l'index en mémoire.
+        """
+        key = self.key(name)
+        with self.lock:
+            existing = self.by_key.get(key)
+            if existing is not None:
+                return existing
+            while True:
+                row = self.connection.execute(
+                    "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'users'), -1),"
+                    " COALESCE((SELECT MAX(id) FROM users), -1)) + 1").fetchone()
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO users (id, name, name_key, created) VALUES (?, ?, ?, ?)",
+                    (max(row[0], min_id), name, key, time.time()))
+                row = self.connection.execute("SELECT id FROM users WHERE name_key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._commit()
+                    return row[0]
+
+    def import_users(self, names):
+        """Importe {id: nom} en conservant les IDs (migration depuis names.json/.pkl)"""
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO users (id, name, name_key, created) VALUES (?, ?, ?, ?)",
+                [(face_id, name, self.key(name), time.time()) for face_id, name in names.items()])
+            self._commit()
+
+    def reserve(self, face_id):
+        """Garantit que les prochains IDs seront supérieurs à `face_id`"""
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO sqlite_sequence (name, seq) VALUES ('users', -1)")
+            self.connection.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'users'", (face_id,))
+            self._commit()
+
+    def remove(self, face_id):
+        with self.lock:
+            self.connection.execute("DELETE FROM users WHERE id = ?", (face_id,))
+            self._commit()
+
+    def add_samples(self, face_id, count, size):
+        """Ajoute `count` échantillons totalisant `size` octets"""
+        with self.lock:
+            self.connection.execute(
+                "UPDATE users SET samples = samples + ?, bytes = bytes + ? WHERE id = ?",
+                (count, size, face_id))
+            self._commit()
+
+    def sync_samples(self, people):
+        """Recalcule les compteurs depuis un scan {nom: [(chemin, mtime, taille), ...]}"""
+        with self.lock:
+            updates = []
+            for name, files in people.items():
+                face_id = self.by_key.get(self.key(name))
+                if face_id is not None:
+                    updates.append((len(files), sum(size for _, _, size in files), face_id))
+            scanned = {self.key(name) for name in people}
+            missing = [(face_id,) for face_id, user in self.by_id.items()
+                       if self.key(user["name"]) not in scanned]
+            self.connection.executemany("UPDATE users SET samples = ?, bytes = ? WHERE id = ?", updates)
+            self.connection.executemany("UPDATE users SET samples = 0, bytes = 0 WHERE id = ?", missing)
+            self._commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,201 @@
+import cv2
+import numpy as np
+import json
+import queue
+import threading
+import time
+
+
+class Overloaded(Exception):
+    """File d'attente pleine: la requête doit être refusée (HTTP 503)"""
+
+
+class _Flight:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 1
+
+
+class SingleFlight:
+    """Partage un même calcul entre les appels concurrents de même clé.
+
+    Le premier appel (meneur) exécute la fonction; les appels de même clé qui
+    arrivent pendant son exécution, ou moins de `window` secondes après son
+    début, attendent et reçoivent le même résultat. Au-delà de `max_pending`
+    appels en cours (meneurs et suiveurs), les nouveaux appels sont refusés
+    immédiatement avec Overloaded plutôt que de s'accumuler.
+    """
+
+    def __init__(self, window=0.1, max_pending=32, timeout=10.0):
+        self.window = window
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.flights = {}
+        self.pending = 0
+        self.executed = 0
+        self.shared = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def call(self, key, fn):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded(f"{self.pending} requêtes déjà en attente")
+            self.pending += 1
+
+            flight = self.flights.get(key)
+            leader = flight is None or (
+                flight.done.is_set() and time.monotonic() - flight.started > self.window
+            )
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.executed += 1
+            else:
+                flight.waiters += 1
+                self.shared += 1
+
+        try:
+            if leader:
+                try:
+                    flight.result = fn()
+                except Exception as e:
+                    flight.error = e
+                finally:
+                    flight.done.set()
+            elif not flight.done.wait(self.timeout):
+                raise TimeoutError("Calcul partagé trop long")
+
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pending": self.pending,
+                "executed": self.executed,
+                "shared": self.shared,
+                "rejected": self.rejected
+            }
+
+
+class FrameResultCache:
+    """Cache du dernier résultat de reconnaissance, valide tant que la scène ne change pas.
+
+    L'empreinte d'une image est une copie 32x24 en niveaux de gris. Un résultat
+    est réutilisé s'il a moins de `ttl` secondes et si l'écart absolu moyen entre
+    l'empreinte de la nouvelle image et celle de l'image en cache est inférieur
+    à `threshold` (niveaux de gris, 0-255). Une entrée par clé (mode de reconnaissance).
+    """
+
+    def __init__(self, ttl=0.5, threshold=4.0, size=(32, 24)):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.size = size
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def fingerprint(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.astype(np.int16)
+
+    def get(self, key, fingerprint):
+        """Retourne le résultat en cache pour cette empreinte, ou None"""
+        if self.ttl <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                stored_at, stored_fingerprint, result = entry
+                fresh = time.monotonic() - stored_at <= self.ttl
+                if fresh and np.abs(fingerprint - stored_fingerprint).mean() < self.threshold:
+                    self.hits += 1
+                    return result
+            self.misses += 1
+            return None
+
+    def put(self, key, fingerprint, result):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), fingerprint, result)
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0
+            }
+
+
+class EventStream:
+    """Diffusion d'événements numérotés à des abonnés (Server-Sent Events).
+
+    Chaque abonné a sa propre file bornée; un abonné trop lent perd les
+    événements les plus anciens plutôt que de bloquer la diffusion. Un nouvel
+    abonné reçoit d'abord le dernier événement publié (état courant).
+    """
+
+    def __init__(self, max_subscribers=8, queue_size=16):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.queues = []
+        self.sequence = 0
+        self.last_event = None
+        self.lock = threading.Lock()
+
+    @property
+    def subscribers(self):
+        with self.lock:
+            return len(self.queues)
+
+    def subscribe(self):
+        with self.lock:
+            if len(self.queues) >= self.max_subscribers:
+                raise Overloaded(f"{len(self.queues)} abonnés déjà connectés")
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            if self.last_event is not None:
+                subscriber.put(self.last_event)
+            self.queues.append(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.queues:
+                self.queues.remove(subscriber)
+
+    def publish(self, data):
+        with self.lock:
+            self.sequence += 1
+            event = dict(data, seq=self.sequence)
+            self.last_event = event
+            for subscriber in self.queues:
+                if subscriber.full():
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+                subscriber.put_nowait(event)
+            return event
+
+    @staticmethod
+    def format(event, name="recognition"):
+        """Sérialise un événement au format text/event-stream"""
+        return f"id: {event['seq']}\nevent: {name}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+import pytest
+
+# main.py crée son système global (registre, modèle, training_data) dans le dossier
+# courant dès l'import: les tests tournent dans un dossier temporaire
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="face-tests-"))
+os.environ.setdefault("CAMERA_SOURCE", os.getcwd())
+
+
+def write_faces(folder, name, count=6, seed=0):
+    """Écrit `count` échantillons 200x200 synthétiques (propres à `seed`) dans folder/name/"""
+    rng = np.random.default_rng(seed)
+    base = cv2.resize(rng.integers(0, 256, (20, 20), dtype=np.uint8), (200, 200))
+    person_folder = os.path.join(folder, name)
+    os.makedirs(person_folder, exist_ok=True)
+    for index in range(count):
+        noise = rng.integers(-8, 9, base.shape)
+        img = np.clip(base.astype(int) + noise, 0, 255).astype(np.uint8)
+        cv2.imwrite(os.path.join(person_folder, f"{name}_{index}.jpg"), img)
+
+
+@pytest.fixture
+def system(tmp_path, monkeypatch):
+    """FaceRecognitionSystem vide dans un dossier de travail propre au test"""
+    import main
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "USERS_DB", str(tmp_path / "users.db"))
+    face_system = main.FaceRecognitionSystem()
+    yield face_system
+    face_system.registry.close()
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def client():
+    import main
+
+    return main.app.test_client()
+
+
+def test_batch_rejects_body_that_is_not_an_object(client):
+    response = client.post('/recognize/batch', json=["aGVsbG8="])
+    assert response.status_code == 400
+
+    response = client.post('/recognize/batch', json={"images": "aGVsbG8="})
+    assert response.status_code == 400
+
+
+def test_batch_reports_items_that_are_not_images(client):
+    response = client.post('/recognize/batch', json={"images": [123, None, {"a": 1}, "aGVsbG8="]})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["error"] for result in results] == ["Invalid image"] * 4
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
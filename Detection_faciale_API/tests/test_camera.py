@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+
+from camera import CaptureService
+
+
+class DyingSource:
+    """Source factice qui livre quelques images puis tombe en panne"""
+    is_live = True
+
+    def __init__(self, frames=3):
+        self.frames = frames
+
+    def open(self):
+        return True
+
+    def read(self):
+        if self.frames <= 0:
+            return False, None
+        self.frames -= 1
+        return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def test_lost_source_never_returns_its_last_frame():
+    capture = CaptureService(0, reconnect_delay=0.2, max_age=0.3)
+    capture.source = DyingSource()
+    assert capture.start()
+    try:
+        assert capture.latest()[1] is not None
+        time.sleep(0.4)
+        assert capture.latest(timeout=0.1) == (None, None)
+        assert capture.recent() == []
+    finally:
+        capture.stop()
@@ -0,0 +1,22 @@
+import cv2
+import numpy as np
+
+from detection import FaceTracker
+
+
+def detect_squares(gray, min_size=None, max_size=None):
+    """Détecteur factice: rectangles englobants des zones claires de l'image"""
+    contours, _ = cv2.findContours((gray > 0).astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return sorted(cv2.boundingRect(contour) for contour in contours)
+
+
+def test_full_search_finds_a_face_outside_the_tracked_region():
+    frame = np.zeros((480, 640), dtype=np.uint8)
+    frame[50:130, 50:130] = 255
+    tracker = FaceTracker(detect_squares)
+    assert tracker.detect(frame) == [(50, 50, 80, 80)]
+
+    frame[300:380, 450:530] = 255
+    assert tracker.detect(frame) == [(50, 50, 80, 80)]
+    assert tracker.detect(frame, full=True) == [(50, 50, 80, 80), (450, 300, 80, 80)]
+    assert tracker.stats() == {"full_searches": 2, "roi_searches": 1, "roi_ratio": 1 / 3}
@@ -0,0 +1,34 @@
+import time
+
+import numpy as np
+
+from inference import FrameRing, RingCapture
+
+
+def test_ring_frame_overwritten_during_read_is_invalid():
+    ring = FrameRing(shape=(4, 4, 3), slots=2, create=True)
+    try:
+        capture = RingCapture(ring)
+        ring.write(np.zeros((4, 4, 3), dtype=np.uint8), time.time())
+        _, frame = capture.latest(timeout=0)
+        assert capture.valid(frame)
+
+        # L'écrivain fait le tour de l'anneau: la case lue contient une autre image
+        ring.write(np.ones((4, 4, 3), dtype=np.uint8), time.time())
+        ring.write(np.full((4, 4, 3), 2, dtype=np.uint8), time.time())
+        assert not capture.valid(frame)
+        del frame
+    finally:
+        ring.close()
+
+
+def test_ring_ignores_frames_older_than_stale_after():
+    ring = FrameRing(shape=(4, 4, 3), slots=4, create=True)
+    try:
+        capture = RingCapture(ring, stale_after=0.5)
+        ring.write(np.zeros((4, 4, 3), dtype=np.uint8), time.time() - 1.0)
+        assert capture.latest(timeout=0) == (None, None)
+        assert capture.recent() == []
+        assert capture.error == "Frame capture error"
+    finally:
+        ring.close()
@@ -0,0 +1,147 @@
+import json
+import time
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import write_faces
+from lbp_index import LBPHIndex, MODEL_HEADER_FILE
+
+
+@pytest.fixture
+def index(tmp_path):
+    rng = np.random.default_rng(0)
+    gallery = LBPHIndex()
+    gallery.train(rng.integers(0, 256, (4, 200, 200), dtype=np.uint8), [0, 0, 1, 1])
+    gallery.write(str(tmp_path / "model"))
+    return gallery
+
+
+def test_read_rejects_inconsistent_model_and_keeps_gallery(tmp_path, index):
+    header_file = tmp_path / "model" / MODEL_HEADER_FILE
+    header = json.loads(header_file.read_text())
+    header["count"] += 1
+    header_file.write_text(json.dumps(header))
+
+    with pytest.raises(ValueError):
+        index.read(str(tmp_path / "model"))
+    assert index.count == 4
+    assert len(index.getLabels()) == 4
+
+
+def test_failed_reload_keeps_current_model(system):
+    write_faces("training_data", "Elhassan", seed=2)
+    system.train_recognizer(full=True)
+    recognizer = system.recognizer
+
+    with open(system.model_file if os.path.isfile(system.model_file)
+              else os.path.join(system.model_file, MODEL_HEADER_FILE), 'w') as f:
+        f.write("{corrompu")
+
+    assert not system.load_model()
+    assert system.is_trained
+    assert system.recognizer is recognizer
+
+
+def test_samples_enrolled_during_background_training_survive_install(system):
+    write_faces("training_data", "Elhassan", seed=2)
+    system.train_recognizer(full=True)
+    system.job_samples = []
+
+    # Modèle produit par l'entraînement en arrière-plan, à partir de training_data
+    model_file, names_file = system.model_paths("job-test")
+    job = system.create_recognizer()
+    job.train([system.known_faces[0][1]], np.array([system.known_faces[0][0]]))
+    job.write(model_file)
+    system.write_names(names_file, dict(system.face_id_to_name))
+    snapshot = time.time()
+
+    # Une personne enrôlée pendant l'entraînement, après sa lecture de training_data
+    late_id = system.register_user("Tardif")
+    late_face = np.full((200, 200), 255, dtype=np.uint8)
+    late_face[::7] = 0
+    system.add_sample(late_id, late_face)
+
+    system.install_model(model_file, names_file, since=snapshot)
+    assert system.face_id_to_name[late_id] == "Tardif"
+    assert system.predict_faces(late_face[None])[0][0] == late_id
+    assert system.job_samples is None
+
+
+def test_incremental_train_picks_up_new_training_data_folder(system):
+    write_faces("training_data", "Elhassan", seed=2)
+    system.train_recognizer(full=True)
+
+    # Photos déposées à la main (README, étape 3), puis entraînement par défaut
+    write_faces("training_data", "Jane", seed=3)
+    system.train_recognizer()
+    jane = system.find_user_id("Jane")
+    assert jane in system.model_labels()
+    assert system.registry.get(jane)["samples"] == 6
+    assert len(system.recognizer.getLabels()) == 12
+
+    # Une photo de plus dans un dossier déjà appris: reconstruction complète
+    write_faces("training_data", "Jane", count=7, seed=3)
+    system.train_recognizer()
+    assert len(system.recognizer.getLabels()) == 13
+
+
+def test_opencv_updates_alternate_between_two_recognizers(system, monkeypatch):
+    import main
+
+    opencv = main.FaceRecognitionSystem(backend="opencv")
+    try:
+        write_faces("training_data", "Elhassan", seed=2)
+        opencv.train_recognizer(full=True)
+        face_id = opencv.find_user_id("Elhassan")
+        faces = np.random.default_rng(4).integers(0, 256, (2, 200, 200), dtype=np.uint8)
+
+        opencv.add_sample(face_id, faces[0])
+        opencv.update_recognizer()
+        first = opencv.recognizer
+
+        # La copie au repos est à jour: plus aucune relecture du modèle
+        monkeypatch.setattr(system, "copy_recognizer", lambda spare=0: pytest.fail("copie du modèle"))
+        opencv.add_sample(face_id, faces[1])
+        opencv.update_recognizer()
+        assert opencv.recognizer is not first
+        assert opencv.spare_recognizer == (opencv.recognizer, first)
+        assert len(opencv.recognizer.getLabels()) == len(first.getLabels()) == 8
+        assert not opencv.model_readers
+    finally:
+        opencv.registry.close()
+
+
+def test_import_does_not_load_the_model(tmp_path):
+    # Les processus lancés par spawn réimportent main: sans système global, ni modèle ni registre
+    code = "import main; assert main.face_system is None"
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, check=True)
+    assert not os.path.exists(tmp_path / "users.db")
+
+
+def test_watch_model_swaps_in_new_model_in_background(system):
+    import main
+
+    write_faces("training_data", "Elhassan", seed=2)
+    system.train_recognizer(full=True)
+    worker = main.FaceRecognitionSystem()
+    stop = threading.Event()
+    watcher = threading.Thread(target=main.watch_model, args=(worker, stop, 0.01))
+    watcher.start()
+    try:
+        write_faces("training_data", "Jane", seed=3)
+        system.train_recognizer()
+        jane = system.find_user_id("Jane")
+        deadline = time.time() + 5
+        while jane not in worker.face_id_to_name and time.time() < deadline:
+            time.sleep(0.01)
+        assert jane in worker.model_labels()
+    finally:
+        stop.set()
+        watcher.join()
+        worker.registry.close()
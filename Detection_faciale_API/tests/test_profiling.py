@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from profiling import SamplingProfiler, SlowRequestTracer
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    return main.app.test_client()
+
+
+@pytest.mark.parametrize("query", ["seconds=nan", "seconds=inf", "seconds=-1", "interval=nan", "interval=0",
+                                   "seconds=0.1&interval=5", "seconds=5&interval=0.5"])
+def test_profile_rejects_invalid_duration_or_interval(client, query):
+    response = client.get(f'/admin/profile?{query}', headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 400
+
+
+def test_admin_requires_token_even_from_localhost(client, monkeypatch):
+    import main
+
+    assert client.get('/admin/traces').status_code == 403
+    assert client.get('/admin/traces?token=wrong').status_code == 403
+    assert client.get('/admin/traces?token=secret').status_code == 200
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert client.get('/admin/traces').status_code == 403
+
+
+def test_profile_never_sleeps_past_its_duration():
+    start = time.monotonic()
+    _, samples = SamplingProfiler().profile(0.05, interval=5)
+    assert time.monotonic() - start < 1
+    assert samples == 1
+
+
+def test_watchdog_samples_requests_past_their_deadline():
+    tracer = SlowRequestTracer(threshold=0.05, interval=0.005)
+    tracer.finish(tracer.start("fast"))
+    assert not tracer.recent()
+
+    token = tracer.start("slow")
+    time.sleep(0.2)
+    tracer.finish(token)
+    traces = tracer.recent()
+    assert [trace["name"] for trace in traces] == ["slow"]
+    assert "test_watchdog_samples_requests_past_their_deadline" in traces[0]["stacks"]
@@ -0,0 +1,53 @@
+import os
+
+from conftest import write_faces
+
+
+def test_delete_with_other_case_removes_folder(system):
+    write_faces("training_data", "Abdelfattah", seed=1)
+    write_faces("training_data", "Elhassan", seed=2)
+    system.train_recognizer(full=True)
+    deleted_id = system.find_user_id("Abdelfattah")
+
+    assert system.delete_user("abdelfattah")
+    assert not os.path.exists(os.path.join("training_data", "Abdelfattah"))
+
+    # Un entraînement complet ne doit pas réenregistrer la personne supprimée
+    system.train_recognizer(full=True)
+    assert system.find_user_id("Abdelfattah") is None
+    assert "Abdelfattah" not in system.face_id_to_name.values()
+    assert deleted_id not in system.model_labels()
+
+
+def test_delete_fails_when_folder_cannot_be_removed(system, monkeypatch):
+    write_faces("training_data", "Elhassan", seed=2)
+    system.train_recognizer(full=True)
+
+    def fail(path):
+        raise PermissionError(path)
+    monkeypatch.setattr("main.shutil.rmtree", fail)
+
+    face_id = system.find_user_id("Elhassan")
+    assert not system.delete_user("ELHASSAN")
+    assert os.path.exists(os.path.join("training_data", "Elhassan"))
+    # L'utilisateur reste enregistré tant que son dossier existe
+    assert system.find_user_id("Elhassan") == face_id
+    assert system.face_id_to_name[face_id] == "Elhassan"
+
+
+def test_name_registered_by_another_process_is_reused(tmp_path):
+    from registry import UserRegistry
+
+    server = UserRegistry(str(tmp_path / "users.db"))
+    job = UserRegistry(str(tmp_path / "users.db"))
+    try:
+        jane = server.add("Jane")
+        # Le processus d'entraînement ne connaît pas encore Jane
+        assert job.add("jane") == jane
+        # ID pris par l'autre processus: le suivant est attribué
+        bob = server.add("Bob")
+        assert job.add("Ali") == bob + 1
+        assert server.add("Ali") == bob + 1
+    finally:
+        server.close()
+        job.close()
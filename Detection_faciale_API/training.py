@@ -0,0 +1,109 @@
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+
+
+class JobRunning(Exception):
+    """Un entraînement est déjà en cours"""
+
+    def __init__(self, job):
+        super().__init__(f"Entraînement {job['id']} déjà en cours")
+        self.job = job
+
+
+class TrainingJobs:
+    """Entraînements en arrière-plan, un à la fois, chacun dans un processus séparé.
+
+    `worker(job_id, options, messages)` tourne dans le processus enfant et envoie
+    des dictionnaires sur `messages`: {"stage": ...} pour la progression, puis
+    {"status": "trained", ...} ou {"status": "failed", "error": ...}. Une fois
+    le modèle construit, `install(job, message)` est appelé dans le processus
+    serveur pour le charger et le mettre en service.
+    """
+
+    def __init__(self, worker, install, history=20):
+        self.worker = worker
+        self.install = install
+        self.history = history
+        self.jobs = {}
+        self.current = None
+        self.lock = threading.Lock()
+        # spawn: le processus enfant n'hérite ni des threads de capture ni du serveur
+        self.context = multiprocessing.get_context("spawn")
+
+    def start(self, options=None):
+        """Lance un entraînement; lève JobRunning si un autre est en cours"""
+        with self.lock:
+            if self.current is not None:
+                raise JobRunning(self.jobs[self.current])
+
+            job_id = uuid.uuid4().hex[:8]
+            job = {
+                "id": job_id,
+                "status": "running",
+                "stage": "starting",
+                "options": dict(options or {}),
+                "started": time.time(),
+                "finished": None,
+                "error": None
+            }
+            self.jobs[job_id] = job
+            self.current = job_id
+            for old_id in list(self.jobs)[:-self.history]:
+                del self.jobs[old_id]
+
+        messages = self.context.Queue()
+        process = self.context.Process(
+            target=self.worker, args=(job_id, job["options"], messages),
+            name=f"train-{job_id}", daemon=True
+        )
+        process.start()
+        threading.Thread(target=self._watch, args=(job, process, messages),
+                         name=f"train-watch-{job_id}", daemon=True).start()
+        return dict(job)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def _update(self, job, **fields):
+        with self.lock:
+            job.update(fields)
+
+    def _watch(self, job, process, messages):
+        result = None
+        while result is None:
+            try:
+                message = messages.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+                continue
+            if "status" in message:
+                result = message
+            else:
+                self._update(job, **message)
+        process.join()
+
+        if result is None:
+            result = {"status": "failed", "error": f"Processus terminé (code {process.exitcode})"}
+
+        if result["status"] == "trained":
+            self._update(job, stage="installing", **{k: v for k, v in result.items() if k != "status"})
+            try:
+                self.install(job, result)
+                result = {"status": "done"}
+            except Exception as e:
+                result = {"status": "failed", "error": f"Installation impossible: {e}"}
+
+        with self.lock:
+            job.update(result, stage=result["status"], finished=time.time())
+            job["duration_s"] = job["finished"] - job["started"]
+            self.current = None
@@ -218,7 +218,8 @@ def check_face_recognition():
         conecte_wifi()
         return False, "Erreur WiFi", 0
 
-    endpoint = DOOR_SERVER_URL + "/recognize"
+    # Réponse compacte "reconnu|nom|confiance" (ex. 1|Alice|87): pas de JSON à décoder
+    endpoint = DOOR_SERVER_URL + "/recognize?format=compact"
     print("\n🔍 Vérification reconnaissance faciale...")
     print("URL:", endpoint)
 
@@ -239,12 +240,19 @@ def check_face_recognition():
 
         if code == 200:
             payload = r.text
-            print("Réponse reçue:", payload[:100] + "..." if len(payload) > 100 else payload)
-
-            data = json.loads(payload)
-            recognized = bool(data.get("recognized", False))
-            name = data.get("name", "")
-            confidence = int(data.get("confidence", 0))
+            print("Réponse reçue:", payload[:100])
+
+            if payload.startswith("{"):
+                # Ancien serveur sans mode compact: réponse JSON
+                data = json.loads(payload)
+                recognized = bool(data.get("recognized", False))
+                name = data.get("name", "")
+                confidence = int(data.get("confidence", 0))
+            else:
+                fields = payload.split("|", 2)
+                recognized = fields[0] == "1"
+                name = fields[1] if len(fields) > 1 else ""
+                confidence = int(fields[2]) if len(fields) > 2 else 0
 
             print("✓ Reconnu:", "OUI" if recognized else "NON")
             print("Nom:", name)